@@ -0,0 +1,51 @@
+"""
+Benchmark: cost of one announcement's background music, before and after
+the background bed was cached in memory
+Run from the root directory:
+    python3 benchmarks/background_bed.py [announcements]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from radio import PATH, TTS, _add_background_music, _background_bed
+
+
+def legacy_background_music(speech):
+    """
+    The previous implementation, which decoded the bed every time
+    """
+    background = AudioSegment.from_wav(PATH["backg_music"])
+    background -= 25 * (1 / TTS["backg_music_vol"])
+    return background.overlay(speech, position=4000)
+
+
+def per_announcement(func, speech, announcements):
+    """
+    Mean wall time of func over the announcements, in milliseconds
+    """
+    start = time.perf_counter()
+    for _ in range(announcements):
+        func(speech)
+    return (time.perf_counter() - start) / announcements * 1000
+
+
+def main():
+    announcements = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    # Ten seconds of speech, in the format the TTS model produces
+    speech = Sine(220, sample_rate=22050).to_audio_segment(duration=10000)
+    legacy = per_announcement(legacy_background_music, speech, announcements)
+    print(f"  legacy: {legacy:7.1f} ms per announcement")
+    _background_bed.cache_clear()
+    cached = per_announcement(_add_background_music, speech, announcements)
+    print(f"  cached: {cached:7.1f} ms per announcement (including the first decode)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: Dialogue.radio on broadcasts from 10 minutes to 3 hours
+The time per broadcast minute should stay flat as the broadcast grows,
+and the peak memory should stay around the size of one segment.
+Run from the root directory:
+    python3 benchmarks/radio_concat.py [minutes ...] [--legacy]
+--legacy also times the previous AudioSegment.append loop, which wrote
+radio.wav and encoded it to mp3 afterwards (up to an hour)
+"""
+
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ffmpy import FFmpeg
+from PIL import Image
+from pydub.generators import Sine
+
+from radio import PATH, Dialogue, _Segment, _canonical
+
+
+def metadata(dialogue):
+    """
+    A fixed poster and tags, so only the render is measured
+    """
+    poster_path = f"{dialogue.audio_dir}/poster.jpeg"
+    Image.new("RGB", (512, 512), color="red").save(poster_path, format="jpeg")
+    return poster_path, {"title": "Benchmark", "artist": "Benchmark"}
+
+
+def build(minutes):
+    """
+    A broadcast of 30 second clips with a 2 second pause after each
+    """
+    dialogue = Dialogue("./bench_audio/")
+    dialogue.metadata = lambda: metadata(dialogue)
+    # Every segment shares one clip, converted to the broadcast's format once,
+    # so nothing needs to be spilled
+    dialogue.timeline.memory_budget = float("inf")
+    clip = Sine(220, sample_rate=22050).to_audio_segment(duration=30000)
+    clip = _canonical(clip)
+    for _ in range(minutes * 60 // 32):
+        dialogue.timeline.add(_Segment(audio=clip))
+        dialogue.timeline.add(_Segment(silence=2000))
+    return dialogue
+
+
+def legacy_radio(dialogue):
+    """
+    The previous implementation of Dialogue.radio
+    """
+    infiles = [dialogue.timeline.load(i) for i in range(len(dialogue.timeline))]
+    base = infiles.pop(0)
+    for infile in infiles:
+        base = base.append(infile)
+    base.export("radio.wav", format="wav")
+    convert = FFmpeg(
+        global_options=["-y", "-loglevel", "error"],
+        inputs={"radio.wav": None},
+        outputs={PATH["broadcast"]: ["-acodec", "libmp3lame", "-b:a", "128k"]},
+    )
+    convert.run()
+    os.remove("radio.wav")
+
+
+def measure(render, minutes):
+    """
+    Wall time and peak traced memory of rendering a broadcast
+    """
+    dialogue = build(minutes)
+    tracemalloc.start()
+    start = time.perf_counter()
+    render(dialogue)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    os.remove(PATH["broadcast"])
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    legacy = "--legacy" in sys.argv[1:]
+    durations = [int(arg) for arg in sys.argv[1:] if arg != "--legacy"]
+    renders = [("streaming", Dialogue.radio)]
+    if legacy:
+        renders.append(("legacy", legacy_radio))
+    try:
+        for minutes in durations or [10, 30, 60, 180]:
+            for name, render in renders:
+                if name == "legacy" and minutes > 60:
+                    continue
+                elapsed, peak = measure(render, minutes)
+                print(
+                    f"{name:>9} {minutes:>4} min: {elapsed:7.2f} s "
+                    f"({elapsed / minutes:.3f} s per minute), peak {peak:7.1f} MB"
+                )
+    finally:
+        shutil.rmtree("./bench_audio/", ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
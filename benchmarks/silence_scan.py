@@ -0,0 +1,115 @@
+"""
+Benchmark: finding the pauses in a long podcast episode, before and after
+the streaming silence detector
+The detector should scan hours of audio in seconds, with a peak memory
+which does not depend on the length of the episode.
+Run from the root directory:
+    python3 benchmarks/silence_scan.py [hours]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy
+
+from radio import _SilenceDetector, _longest_clip
+
+SAMPLE_RATE = 22050
+
+
+class Episode:
+    """
+    A file-like PCM stream of synthetic talk: noise bursts of 2 to 40
+    seconds with pauses of 0.2 to 3 seconds. Ten minutes of it are
+    generated up front and repeated, so reading it costs next to nothing.
+    """
+
+    def __init__(self, hours):
+        rng = numpy.random.default_rng(0)
+        chunks, length = [], 0
+        while length < 600 * SAMPLE_RATE:
+            talk = int(rng.uniform(2, 40) * SAMPLE_RATE)
+            pause = int(rng.uniform(0.2, 3) * SAMPLE_RATE)
+            chunks.append(rng.integers(-20000, 20000, talk, dtype=numpy.int16))
+            chunks.append(rng.integers(-500, 500, pause, dtype=numpy.int16))
+            length += talk + pause
+        self.pattern = numpy.concatenate(chunks).tobytes()
+        self.left = int(hours * 3600 * SAMPLE_RATE) * 2
+        self.offset = 0
+
+    def read(self, size):
+        size = min(size, self.left, len(self.pattern) - self.offset)
+        raw = self.pattern[self.offset : self.offset + size]
+        self.offset = (self.offset + size) % len(self.pattern)
+        self.left -= size
+        return raw
+
+
+def legacy_scan(stream):
+    """
+    The previous loop over 2.2 second buffers (numpy.fromstring, which is
+    deprecated, replaced by frombuffer)
+    """
+    silence_timestamps = []
+    silence_duration = 1.1
+    threshold = int(float(0.1 * 65535))
+    threshold_sampling_rate = silence_duration * SAMPLE_RATE
+    buffer_length = int(threshold_sampling_rate * 2)
+    prev_arr = numpy.arange(1, dtype="int16")
+    position, prev_position = 0, 0
+    while True:
+        raw = stream.read(buffer_length)
+        if len(prev_arr) == 0 or raw == "":
+            break
+        curr_arr = numpy.frombuffer(raw, dtype="int16")
+        curr_range = numpy.concatenate([prev_arr, curr_arr])
+        maximum = numpy.amax(curr_range) if len(curr_range) else 0
+        if maximum <= threshold:
+            trng = (curr_range <= threshold) * 1
+            samples = numpy.sum(trng)
+            if samples >= threshold_sampling_rate:
+                end_time = position + silence_duration * 0.5
+                if end_time - prev_position <= 600:
+                    silence_timestamps.append((prev_position, end_time))
+                prev_position = position + silence_duration * 0.5
+        position += silence_duration
+        prev_arr = curr_arr
+    return silence_timestamps
+
+
+def detector_scan(stream):
+    detector = _SilenceDetector(int(1.1 * SAMPLE_RATE), int(0.1 * 65535))
+    return _longest_clip(detector.scan(stream), 600 * SAMPLE_RATE)
+
+
+def measure(scan, hours):
+    """
+    Wall time and peak traced memory of one scan
+    """
+    stream = Episode(hours)
+    # The synthetic episode is not counted
+    tracemalloc.start()
+    start = time.perf_counter()
+    scan(stream)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for name, scan in (("legacy", legacy_scan), ("detector", detector_scan)):
+        elapsed, peak = measure(scan, hours)
+        print(
+            f"{name:>10}: {elapsed:6.1f} s for {hours:g} h "
+            f"({hours * 3600 / elapsed:6.0f}x real time), peak {peak:5.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
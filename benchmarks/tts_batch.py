@@ -0,0 +1,59 @@
+"""
+Benchmark: batched VITS inference vs. one Synthesizer.tts call per chunk
+Run from the root directory:
+    python3 benchmarks/tts_batch.py [batch_size ...]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from radio import PATH, TTS, Dialogue, _SuppressTTSLogs, _synthesize_batch
+
+
+def chunks_per_second(func, chunks, repeat=3):
+    """
+    Best throughput over a few runs
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(chunks)
+        best = min(best, time.perf_counter() - start)
+    return len(chunks) / best
+
+
+def main():
+    batch_sizes = [int(size) for size in sys.argv[1:]] or [2, 4, 8]
+    with open(PATH["ads"], "r", encoding="UTF-8") as file:
+        chunks = list(json.load(file).values())[:16]
+    synthesizer = Dialogue.init_speech()
+
+    def per_chunk(texts):
+        with _SuppressTTSLogs():
+            for text in texts:
+                synthesizer.tts(text, speaker_name=TTS["speaker_name"], style_wav="")
+
+    def batched(size):
+        def run(texts):
+            with _SuppressTTSLogs():
+                for start in range(0, len(texts), size):
+                    _synthesize_batch(synthesizer, texts[start : start + size])
+
+        return run
+
+    baseline = chunks_per_second(per_chunk, chunks)
+    print(f"per-chunk loop: {baseline:.2f} chunks/s")
+    for size in batch_sizes:
+        throughput = chunks_per_second(batched(size), chunks)
+        print(
+            f"batch_size={size}: {throughput:.2f} chunks/s "
+            f"({throughput / baseline:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,23 +9,35 @@ Author: Parth Parikh (parthparikh1999p@gmail.com)
 # For sentence tokenization
 #   nltk.download("punkt")
 
+import argparse
+import base64
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import contextlib
 import datetime
-import glob
+import functools
+import hashlib
+import http.server
+import io
 import json
 import logging
+import multiprocessing
 import random
 import os
 from pathlib import Path
+import queue
 import re
+import shutil
+import socket
+import socketserver
+import sqlite3
 import subprocess
 import sys
+import threading
 import time
-import urllib.request
+import urllib.parse
 import uuid
 
 import billboard
-import eyed3
-from eyed3.id3.frames import ImageFrame
 from feedparser import parse
 from ffmpy import FFmpeg
 import itunespy
@@ -42,16 +54,15 @@ import requests
 import ytmdl
 import yt_dlp
 
-from TTS.server.server import create_argparser
+# The synthesizer itself (and torch) is imported lazily in Dialogue.init_speech
+# as it is not needed when a synthesizer daemon is running
 from TTS.tts.utils.text.cleaners import english_cleaners
-from TTS.utils.manage import ModelManager
-from TTS.utils.synthesizer import Synthesizer
-from TTS import __file__ as tts_path
 
 with open("./config.json", "r", encoding="UTF-8") as conf_file:
     _CONFIG = json.load(conf_file)
     PATH = _CONFIG["PATH"]
     TTS = _CONFIG["TTS"]
+    AUDIO = _CONFIG["AUDIO"]
 
 _logger = logging.getLogger()
 _logger.setLevel(logging.INFO)
@@ -74,6 +85,1856 @@ class _SuppressTTSLogs:
         sys.stdout = self._original_stdout
 
 
+def _atomic_write(path, data):
+    """
+    Writes the bytes to path through a temporary file, which then replaces
+    path, so readers never see a partially written file
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex[:10]}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class _ClipCache:
+    """
+    On-disk cache of audio clips, such as synthesized speech
+    Clips are stored under a hash of everything that affects the audio
+    (for speech: text, speaker, model and synthesis parameters).
+    The cache is size-bounded and evicts the least recently used clips,
+    where a clip's mtime is refreshed every time it is used.
+    """
+
+    # Files which count towards the cache's budget
+    suffixes = (".wav",)
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits, self.misses = 0, 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(**params):
+        """
+        Content address for a clip made with the given parameters
+        """
+        blob = json.dumps(params, sort_keys=True).encode("UTF-8")
+        return hashlib.sha256(blob).hexdigest()
+
+    def load(self, key):
+        """
+        Loads the cached clip, returns None on a miss
+        """
+        path = os.path.join(self.cache_dir, f"{key}.wav")
+        try:
+            audio = AudioSegment.from_wav(path)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return audio
+
+    def store(self, key, audio):
+        """
+        Stores the clip in the cache and evicts old clips if needed
+        """
+        wav = io.BytesIO()
+        audio.export(wav, format="wav")
+        _atomic_write(os.path.join(self.cache_dir, f"{key}.wav"), wav.getvalue())
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used clips until the cache fits its budget
+        """
+        clips = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(self.suffixes):
+                stat = entry.stat()
+                clips.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in clips)
+        for _, size, path in sorted(clips):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class _MusicLibrary:
+    """
+    On-disk library of downloaded songs, shared across broadcasts
+    Every song is stored once under a hash of its source URL, next to a JSON
+    sidecar with its names, size, checksum and resolved metadata. Songs are
+    found by source URL or by their normalized (artist, title).
+    The library is size-bounded and evicts the least recently used songs,
+    except the ones used by the current broadcast.
+    """
+
+    def __init__(self, library_dir, max_bytes):
+        self.library_dir = library_dir
+        self.max_bytes = max_bytes
+        self.hits, self.misses, self.bytes_saved = 0, 0, 0
+        # Songs are stored and looked up from the download threads
+        self.lock = threading.Lock()
+        # Songs of the current broadcast, which are never evicted
+        self.pinned = set()
+        # Normalized (artist, title) -> key
+        self.names = {}
+        os.makedirs(self.library_dir, exist_ok=True)
+        for entry in os.scandir(self.library_dir):
+            if entry.name.endswith(".json"):
+                key = entry.name[: -len(".json")]
+                try:
+                    sidecar = self.read(key)
+                except (OSError, ValueError):
+                    continue
+                for name in sidecar["names"]:
+                    self.names[name] = key
+
+    @staticmethod
+    def name(artist, title):
+        """
+        Normalized (artist, title) of a song
+        """
+
+        def normalize(text):
+            text = re.sub(r"[^\w\s]", " ", (text or "").lower())
+            return " ".join(text.split())
+
+        return f"{normalize(artist)}|{normalize(title)}"
+
+    @staticmethod
+    def key(url):
+        """
+        Content address of a song downloaded from url
+        """
+        return hashlib.sha256(url.encode("UTF-8")).hexdigest()
+
+    @staticmethod
+    def checksum(path):
+        """
+        sha256 of a file, read in blocks of a megabyte
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def read(self, key):
+        """
+        Sidecar of a song
+        """
+        with open(os.path.join(self.library_dir, f"{key}.json"), "rb") as file:
+            return json.load(file)
+
+    def write(self, key, sidecar):
+        """
+        Replaces the sidecar of a song
+        """
+        path = os.path.join(self.library_dir, f"{key}.json")
+        _atomic_write(path, json.dumps(sidecar).encode("UTF-8"))
+
+    def find(self, artist=None, title=None, url=None):
+        """
+        Path of a song in the library, by url or else by (artist, title)
+        Returns None on a miss. Songs which fail the integrity check
+        are removed, so that they are downloaded again.
+        """
+        name = self.name(artist, title)
+        with self.lock:
+            key = self.key(url) if url is not None else self.names.get(name)
+            try:
+                sidecar = self.read(key) if key is not None else None
+            except (OSError, ValueError):
+                sidecar = None
+            if sidecar is None:
+                return None
+            path = os.path.join(self.library_dir, sidecar["file"])
+            try:
+                intact = os.path.getsize(path) == sidecar["size"] and (
+                    self.checksum(path) == sidecar["sha256"]
+                )
+            except OSError:
+                intact = False
+            if not intact:
+                logging.warning(f"Removing corrupt song {path} from the library.")
+                self.remove(key)
+                return None
+            if title is not None and name not in sidecar["names"]:
+                # The same song under another name
+                sidecar["names"].append(name)
+                self.write(key, sidecar)
+                self.names[name] = key
+            os.utime(path)
+            self.pinned.add(key)
+            self.hits += 1
+            self.bytes_saved += sidecar["size"]
+            return path
+
+    def store(self, url, artist, title, song_path, source=None):
+        """
+        Moves a downloaded song into the library and returns its new path
+        """
+        key = self.key(url)
+        name = self.name(artist, title)
+        path = os.path.join(self.library_dir, key + os.path.splitext(song_path)[1])
+        sidecar = {
+            "url": url,
+            "names": [name],
+            "file": os.path.basename(path),
+            "size": os.path.getsize(song_path),
+            "sha256": self.checksum(song_path),
+            "source": source,
+        }
+        shutil.move(song_path, path)
+        with self.lock:
+            self.write(key, sidecar)
+            self.names[name] = key
+            self.pinned.add(key)
+            self.misses += 1
+            self.evict()
+        return path
+
+    def field(self, path, name):
+        """
+        A field of the sidecar of a song in the library, None if it is missing
+        """
+        key = self.key_of(path)
+        if key is None:
+            return None
+        with self.lock:
+            try:
+                return self.read(key).get(name)
+            except (OSError, ValueError):
+                return None
+
+    def metadata(self, path):
+        """
+        Metadata resolved for a song in the library, None if there is none yet
+        """
+        return self.field(path, "metadata")
+
+    def source(self, path):
+        """
+        Artist and title of a song as reported by the site it came from
+        """
+        return self.field(path, "source")
+
+    def annotate(self, path, metadata):
+        """
+        Keeps the metadata resolved for a song in the library
+        """
+        key = self.key_of(path)
+        if key is None:
+            return
+        with self.lock:
+            try:
+                sidecar = self.read(key)
+            except (OSError, ValueError):
+                return
+            sidecar["metadata"] = metadata
+            self.write(key, sidecar)
+
+    def key_of(self, path):
+        """
+        Key of a song in the library, None for any other file
+        """
+        library_dir = os.path.abspath(self.library_dir)
+        if os.path.dirname(os.path.abspath(path)) != library_dir:
+            return None
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def remove(self, key):
+        """
+        Removes a song and its sidecar (the caller holds the lock)
+        """
+        try:
+            sidecar = self.read(key)
+            os.remove(os.path.join(self.library_dir, sidecar["file"]))
+        except (OSError, ValueError):
+            pass
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(self.library_dir, f"{key}.json"))
+        self.names = {name: other for name, other in self.names.items() if other != key}
+
+    def evict(self):
+        """
+        Removes the least recently used songs until the library fits its budget
+        (the caller holds the lock)
+        """
+        songs = []
+        for entry in os.scandir(self.library_dir):
+            key, ext = os.path.splitext(entry.name)
+            if ext in (".json", ".tmp"):
+                continue
+            stat = entry.stat()
+            songs.append((stat.st_mtime, stat.st_size, key))
+        total = sum(size for _, size, _ in songs)
+        for _, size, key in sorted(songs):
+            if total <= self.max_bytes:
+                break
+            if key in self.pinned:
+                continue
+            self.remove(key)
+            total -= size
+
+
+class _FeedCache:
+    """
+    Podcast feeds, fetched and parsed once per broadcast
+    Parsed feeds are kept on disk with their ETag and Last-Modified headers,
+    so a later broadcast only downloads a feed again when it has changed.
+    """
+
+    def __init__(self, cache_dir, timeout):
+        self.cache_dir = cache_dir
+        # (connect, read) timeouts in seconds
+        self.timeout = timeout
+        self.feeds = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, url):
+        """
+        Where a feed is cached on disk
+        """
+        key = hashlib.sha256(url.encode("UTF-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, url):
+        """
+        The parsed feed, fetched only if it is not cached or has changed
+        A cached feed is used as is when the feed can not be fetched.
+        """
+        if url in self.feeds:
+            return self.feeds[url]
+        try:
+            with open(self.path(url), encoding="UTF-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["modified"]:
+                headers["If-Modified-Since"] = cached["modified"]
+
+        try:
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if cached is None:
+                raise
+            logging.warning(f"Could not refresh {url} ({e}). Using the cached feed.")
+            response = None
+        if response is None or response.status_code == 304:
+            parsed = cached["feed"]
+        else:
+            parsed = podcastparser.parse(url, io.BytesIO(response.content))
+            entry = {
+                "etag": response.headers.get("ETag"),
+                "modified": response.headers.get("Last-Modified"),
+                "feed": parsed,
+            }
+            _atomic_write(self.path(url), json.dumps(entry).encode("UTF-8"))
+        self.feeds[url] = parsed
+        return parsed
+
+
+class _EpisodeCache(_ClipCache):
+    """
+    On-disk cache of podcast episodes
+    The analysis of an episode (the pauses found in it and the clips cut
+    from it) is kept as JSON next to its clips. Both count towards the same
+    budget and are evicted least recently used first.
+    """
+
+    suffixes = (".wav", ".json")
+
+    def analysis(self, key):
+        """
+        The episode's analysis, None if it was not analyzed (or was evicted)
+        """
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(path) as f:
+                analysis = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return analysis
+
+    def analyzed(self, key, analysis):
+        """
+        Saves the episode's analysis and evicts old entries if needed
+        """
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        _atomic_write(path, json.dumps(analysis).encode("UTF-8"))
+        self.evict()
+
+
+# Podcasts are decoded to mono at this rate to look for pauses
+_SCAN_RATE = 22050
+
+
+class _SilenceDetector:
+    """
+    Finds the pauses in a stream of mono, signed 16-bit PCM
+    A pause is a run of at least min_samples samples whose peaks stay at or
+    below threshold. PCM is fed in blocks of any size and cut into frames of
+    frame_size samples, whose peaks are computed with NumPy a block at a
+    time. Only the frames around a pause are looked at sample by sample, so
+    pauses are found with sample accuracy, and only the last loud sample
+    is kept between blocks, so memory use does not grow with the stream.
+    Pauses are (start, end) sample offsets, end excluded.
+    """
+
+    def __init__(self, min_samples, threshold, frame_size=1024):
+        self.min_samples = min_samples
+        self.threshold = threshold
+        # A pause has to span a whole frame for the frame peaks to find it
+        self.frame_size = max(1, min(frame_size, (min_samples + 1) // 2))
+        # Samples seen so far and the last one above the threshold
+        self.position = 0
+        self.last_loud = -1
+        # The partial frame left over from the previous block
+        self.rest = b""
+
+    def loud(self, samples):
+        """
+        Offsets of the samples above the threshold
+        """
+        return numpy.flatnonzero(
+            (samples > self.threshold) | (samples < -self.threshold)
+        )
+
+    def feed(self, raw):
+        """
+        Scans the next block of PCM, returns the pauses it ended
+        """
+        if self.rest:
+            raw = self.rest + raw
+        frame_bytes = 2 * self.frame_size
+        usable = len(raw) - len(raw) % frame_bytes
+        self.rest = raw[usable:]
+        frames = numpy.frombuffer(raw, dtype="<i2", count=usable // 2)
+        frames = frames.reshape(-1, self.frame_size)
+        first = self.position // self.frame_size
+        self.position += usable // 2
+        loud = numpy.flatnonzero(
+            (frames.max(axis=1, initial=0) > self.threshold)
+            | (frames.min(axis=1, initial=0) < -self.threshold)
+        )
+        if len(loud) == 0:
+            return []
+
+        pauses = []
+        # Loud frames with quiet frames in between, the first one being the
+        # frame of the last loud sample before this block
+        edges = numpy.concatenate(([self.last_loud // self.frame_size - first], loud))
+        for i in numpy.flatnonzero(numpy.diff(edges) > 1):
+            before, after = int(edges[i]), int(edges[i + 1])
+            start = self.last_loud + 1
+            if before >= 0:
+                start = (first + before) * self.frame_size
+                start += int(self.loud(frames[before])[-1]) + 1
+            end = (first + after) * self.frame_size + int(self.loud(frames[after])[0])
+            if end - start >= self.min_samples:
+                pauses.append((start, end))
+        self.last_loud = (first + int(loud[-1])) * self.frame_size
+        self.last_loud += int(self.loud(frames[loud[-1]])[-1])
+        return pauses
+
+    def close(self):
+        """
+        Ends the stream, returns the pauses it ended
+        """
+        samples = numpy.frombuffer(self.rest, dtype="<i2", count=len(self.rest) // 2)
+        self.rest = b""
+        # The partial frame is too short to hold a pause of its own
+        loud = self.loud(samples) + self.position
+        self.position += len(samples)
+        pauses = []
+        if len(loud):
+            if loud[0] - self.last_loud - 1 >= self.min_samples:
+                pauses.append((self.last_loud + 1, int(loud[0])))
+            self.last_loud = int(loud[-1])
+        if self.position - self.last_loud - 1 >= self.min_samples:
+            pauses.append((self.last_loud + 1, self.position))
+        return pauses
+
+    def scan(self, stream, block_size=1 << 20):
+        """
+        Yields the pauses of a file-like PCM stream, reading it in blocks
+        of block_size bytes
+        """
+        while True:
+            raw = stream.read(block_size)
+            if not raw:
+                break
+            yield from self.feed(raw)
+        yield from self.close()
+
+
+def _longest_clip(pauses, max_samples):
+    """
+    Longest stretch between two consecutive pauses which is at most
+    max_samples long, as (start, end) sample offsets, or None
+    Clips start and end in the middle of the pauses, and the first one
+    starts at the beginning of the stream.
+    """
+    best, previous = None, 0
+    for start, end in pauses:
+        middle = (start + end) // 2
+        if middle - previous <= max_samples and (
+            best is None or middle - previous > best[1] - best[0]
+        ):
+            best = (previous, middle)
+        previous = middle
+    return best
+
+
+def _fetch_ranges(url, chunk_size, budget, timeout):
+    """
+    Yields the first budget bytes of url, chunk_size bytes at a time, each
+    chunk fetched with its own HTTP Range request
+    Servers which ignore Range are read as a single streamed response.
+    """
+    with requests.Session() as session:
+        offset = 0
+        while offset < budget:
+            end = min(offset + chunk_size, budget) - 1
+            with session.get(
+                url,
+                headers={"Range": f"bytes={offset}-{end}"},
+                timeout=timeout,
+                stream=True,
+            ) as response:
+                if response.status_code == 416:
+                    # Past the end of the file
+                    return
+                response.raise_for_status()
+                if response.status_code != 206:
+                    # Such servers ignore the first request's Range as well
+                    for chunk in response.iter_content(chunk_size):
+                        yield chunk[: budget - offset]
+                        offset += len(chunk)
+                        if offset >= budget:
+                            return
+                    return
+                chunk = response.content
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if not chunk:
+                return
+            yield chunk
+            offset += len(chunk)
+            if total.isdigit() and offset >= int(total):
+                return
+
+
+class _TokenBucket:
+    """
+    Token-bucket rate limiter for a web service
+    Tokens refill at rate per second up to capacity, and every request takes
+    one. Requests past the burst wait their turn in order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be made
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # Taking the token in advance keeps waiting threads in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _rate_limited(call, bucket, retries, backoff):
+    """
+    Makes a request under a rate limit, retrying failures after
+    exponentially growing delays with full jitter
+    """
+    for attempt in range(retries):
+        bucket.acquire()
+        try:
+            return call()
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            delay = random.uniform(0, backoff * 2**attempt)
+            logging.warning(f"Request failed ({e}). Trying again in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+class _MetadataCache:
+    """
+    Persistent cache of the metadata looked up online, keyed by normalized
+    query. Entries are kept in memory and written through to a JSON file,
+    so a query is only sent once across broadcasts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits, self.misses = 0, 0
+        self.lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def get(self, key):
+        """
+        Cached metadata, None on a miss
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """
+        Caches the metadata and saves the cache
+        """
+        with self.lock:
+            self.entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            _atomic_write(self.path, json.dumps(self.entries).encode("UTF-8"))
+
+
+def _closest_artist(candidates, artist):
+    """
+    First candidate whose artistName is closest to artist by edit distance
+    Each distinct name is scored once, names whose length alone puts them
+    further away than the best so far are skipped, and an exact match ends
+    the search.
+    """
+    best, best_distance, scored = None, None, {}
+    for candidate in candidates:
+        name = candidate["artistName"]
+        if best is not None and (
+            name in scored or abs(len(name) - len(artist)) >= best_distance
+        ):
+            continue
+        distance = scored[name] = nltk.edit_distance(name, artist)
+        if best is None or distance < best_distance:
+            best, best_distance = candidate, distance
+            if distance == 0:
+                break
+    return best
+
+
+# Guards sys.argv while ytmdl parses it (songs are downloaded on several threads)
+_ARGV_LOCK = threading.Lock()
+
+
+def _ytmdl_arguments(song, artist=None):
+    """
+    ytmdl's arguments for searching a song
+    ytmdl.main.arguments parses sys.argv, which holds radio.py's own flags,
+    so it is given an explicit argument list instead
+    """
+    with _ARGV_LOCK:
+        argv = sys.argv
+        sys.argv = [argv[0], "--quiet", "--choice", "1", "--", song]
+        try:
+            args = ytmdl.main.arguments()
+        finally:
+            sys.argv = argv
+    if artist:
+        args.artist = artist
+    return args
+
+
+# A small audio core on float32 NumPy arrays shaped (frames, channels)
+# pydub is only used to decode and encode, as every AudioSegment operation
+# copies the whole clip
+
+# Sample rate conversions made by this process (see Dialogue.flow)
+# TTS workers report their own along with every clip (see _render_speech)
+_RESAMPLES = {"count": 0}
+
+
+def _to_array(audio, start_ms=0, end_ms=None):
+    """
+    Samples of an AudioSegment as float32 in [-1, 1)
+    Only the frames from start_ms to end_ms are converted
+    """
+    if audio.sample_width not in (2, 4):
+        audio = audio.set_sample_width(2)
+    dtype = numpy.int16 if audio.sample_width == 2 else numpy.int32
+    frames = numpy.frombuffer(audio.raw_data, dtype=dtype)
+    frames = frames.reshape(-1, audio.channels)
+    start = int(start_ms * audio.frame_rate / 1000)
+    end = None if end_ms is None else int(end_ms * audio.frame_rate / 1000)
+    scale = numpy.float32(1 << (8 * audio.sample_width - 1))
+    return frames[start:end].astype(numpy.float32) / scale
+
+
+def _to_pcm(samples):
+    """
+    Samples as PCM in the broadcast's sample width
+    """
+    scale = 1 << (8 * AUDIO["sample_width"] - 1)
+    dtype = "<i2" if AUDIO["sample_width"] == 2 else "<i4"
+    pcm = numpy.clip(numpy.rint(samples * scale), -scale, scale - 1)
+    return pcm.astype(dtype).tobytes()
+
+
+def _to_segment(samples, frame_rate):
+    """
+    Samples as an AudioSegment in the broadcast's sample width
+    """
+    return AudioSegment(
+        data=_to_pcm(samples),
+        sample_width=AUDIO["sample_width"],
+        frame_rate=frame_rate,
+        channels=samples.shape[1],
+    )
+
+
+def _gain(samples, db, start=0, stop=None):
+    """
+    Changes the volume of the frames from start to stop by db decibels
+    Lowering only a range ducks that part of the clip
+    """
+    samples = samples.copy()
+    samples[start:stop] *= numpy.float32(10 ** (db / 20))
+    return samples
+
+
+def _overlay(base, samples, offset):
+    """
+    Mixes samples into base, starting offset frames in
+    Like pydub, the result is as long as base
+    """
+    mixed = base.copy()
+    end = min(len(base), offset + len(samples))
+    if end > offset:
+        mixed[offset:end] += samples[: end - offset]
+    return mixed
+
+
+def _resample(samples, frame_rate, target):
+    """
+    Linearly interpolates samples from frame_rate to target
+    Like audioop.ratecv, frames past the last sample are not extrapolated
+    """
+    if frame_rate == target or len(samples) == 0:
+        return samples
+    _RESAMPLES["count"] += 1
+    frames = (len(samples) - 1) * target // frame_rate + 1
+    positions = numpy.arange(frames) * (frame_rate / target)
+    left = positions.astype(numpy.int64)
+    right = numpy.minimum(left + 1, len(samples) - 1)
+    weight = (positions - left).astype(numpy.float32)[:, None]
+    return samples[left] + (samples[right] - samples[left]) * weight
+
+
+def _remix(samples, channels):
+    """
+    Converts between mono and multichannel audio
+    Mono is copied to every channel, and channels are averaged down to mono
+    """
+    if samples.shape[1] == channels:
+        return samples
+    if samples.shape[1] == 1:
+        return numpy.repeat(samples, channels, axis=1)
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True)
+    raise ValueError(f"Cannot remix {samples.shape[1]} channels to {channels}")
+
+
+def _conform(audio):
+    """
+    Samples of an AudioSegment in the broadcast's rate and channels
+    """
+    samples = _resample(_to_array(audio), audio.frame_rate, AUDIO["sample_rate"])
+    return _remix(samples, AUDIO["channels"])
+
+
+def _canonical(audio):
+    """
+    An AudioSegment in the broadcast's format (AUDIO in config.json)
+    Audio which is already in that format is returned as is
+    """
+    audio_format = (audio.frame_rate, audio.channels, audio.sample_width)
+    if audio_format == (AUDIO["sample_rate"], AUDIO["channels"], AUDIO["sample_width"]):
+        return audio
+    return _to_segment(_conform(audio), AUDIO["sample_rate"])
+
+
+def _decode_window(path, start_ms, end_ms, timeout=None):
+    """
+    Decodes start_ms to end_ms of an audio file into the broadcast's format
+    ffmpeg seeks to start_ms before decoding and stops at end_ms, so the rest
+    of the file is never decoded or held in memory.
+    path can also be a URL, in which case ffmpeg only fetches the bytes it
+    needs and gives up after timeout seconds without data.
+    """
+    pcm_format = f"s{8 * AUDIO['sample_width']}le"
+    network = [] if timeout is None else ["-rw_timeout", str(int(timeout * 1e6))]
+    result = subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            *network,
+            "-ss",
+            f"{start_ms / 1000:.3f}",
+            "-t",
+            f"{(end_ms - start_ms) / 1000:.3f}",
+            "-i",
+            path,
+            "-f",
+            pcm_format,
+            "-acodec",
+            f"pcm_{pcm_format}",
+            "-ar",
+            str(AUDIO["sample_rate"]),
+            "-ac",
+            str(AUDIO["channels"]),
+            "-",
+        ],
+        capture_output=True,
+        check=True,
+    )
+    return AudioSegment(
+        data=result.stdout,
+        sample_width=AUDIO["sample_width"],
+        frame_rate=AUDIO["sample_rate"],
+        channels=AUDIO["channels"],
+    )
+
+
+class _Segment:
+    """
+    A piece of the broadcast, which is one of
+        audio: PCM held in memory (an AudioSegment)
+        path: a lazy reference to an audio file, decoded when rendered
+        future: a clip which the TTS worker pool is still synthesizing
+        silence: a virtual pause of that many milliseconds
+    """
+
+    def __init__(self, audio=None, path=None, future=None, silence=0, temporary=False):
+        self.audio = audio
+        self.path = path
+        self.future = future
+        self.silence = silence
+        # Temporary files are deleted along with the timeline
+        self.temporary = temporary
+
+    @property
+    def is_silence(self):
+        """
+        Whether the segment is a virtual silence
+        """
+        return self.audio is None and self.path is None and self.future is None
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the segment's PCM
+        """
+        return len(self.audio.raw_data) if self.audio is not None else 0
+
+    def load(self):
+        """
+        Audio of the segment, in the broadcast's format
+        In-memory audio is converted when it is added to the timeline, and
+        silence is made in that format. The rest is converted here, and the
+        timeline keeps the result (see _Timeline.load and _Timeline.collect).
+        """
+        if self.audio is not None:
+            # Only segments which never went through a timeline are converted
+            return _canonical(self.audio)
+        if self.future is not None:
+            _, audio, _ = self.future.result()
+            return _canonical(audio)
+        if self.path is not None:
+            return _canonical(AudioSegment.from_file(self.path))
+        frame_width = AUDIO["channels"] * AUDIO["sample_width"]
+        frames = AUDIO["sample_rate"] * self.silence // 1000
+        return AudioSegment(
+            data=bytes(frames * frame_width),
+            sample_width=AUDIO["sample_width"],
+            frame_rate=AUDIO["sample_rate"],
+            channels=AUDIO["channels"],
+        )
+
+
+def _write_pcm(segment, write):
+    """
+    Writes the PCM of a segment in the broadcast's format
+    """
+    frame_width = AUDIO["channels"] * AUDIO["sample_width"]
+    if segment.is_silence:
+        # Written in blocks of a second, it is never rendered in full
+        frames = AUDIO["sample_rate"] * segment.silence // 1000
+        block = bytes(AUDIO["sample_rate"] * frame_width)
+        for start in range(0, frames, AUDIO["sample_rate"]):
+            size = min(AUDIO["sample_rate"], frames - start)
+            write(block[: size * frame_width])
+        return
+    # Segments are already in the broadcast's format, so this is a plain copy
+    write(segment.load().raw_data)
+
+
+class _Timeline:
+    """
+    The ordered segments of a broadcast
+    Speech is kept in memory and silence is virtual, so most segments never
+    touch the disk. Once the in-memory audio grows beyond the memory budget,
+    the oldest in-memory segments are spilled to wav files in spill_dir.
+    """
+
+    def __init__(self, spill_dir, memory_budget):
+        self.spill_dir = spill_dir
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.segments = []
+
+    def __len__(self):
+        return len(self.segments)
+
+    def add(self, segment, position=None):
+        """
+        Adds a segment at the end of the timeline (or before position)
+        """
+        self.collect()
+        if segment.audio is not None:
+            segment.audio = _canonical(segment.audio)
+        if position is None:
+            self.segments.append(segment)
+        else:
+            self.segments.insert(position, segment)
+        self.memory_used += segment.nbytes
+        self.spill()
+
+    def replace(self, position, audio):
+        """
+        Replaces the audio of the segment at position
+        """
+        old = self.segments[position]
+        self.memory_used -= old.nbytes
+        if old.temporary:
+            os.remove(old.path)
+        self.segments[position] = _Segment(audio=_canonical(audio))
+        self.memory_used += self.segments[position].nbytes
+        self.spill()
+
+    def load(self, position):
+        """
+        Audio of the segment at position
+        Clips which had to be converted (TTS clips and songs) are kept in
+        memory, where they count towards the budget, so they are converted
+        only once
+        """
+        segment = self.segments[position]
+        audio = segment.load()
+        if segment.future is not None or (
+            segment.path is not None and not segment.temporary
+        ):
+            self.replace(position, audio)
+        return audio
+
+    def collect(self):
+        """
+        Keeps the clips which the TTS worker pool finished as in-memory audio,
+        so they count towards the budget and can be spilled
+        Clips which failed are left to fail when they are rendered.
+        """
+        for position, segment in enumerate(self.segments):
+            future = segment.future
+            if future is not None and future.done() and future.exception() is None:
+                self.replace(position, segment.load())
+
+    def stream(self, write, start=0, stop=None):
+        """
+        Writes the PCM of the segments from start to stop in order,
+        in the broadcast's format
+        Segments are converted one at a time, so the time taken grows linearly
+        with the broadcast and only one segment is in memory
+        """
+        for segment in self.segments[start:stop]:
+            _write_pcm(segment, write)
+
+    def spill(self):
+        """
+        Moves the oldest in-memory segments to disk until the budget is met
+        """
+        for segment in self.segments:
+            if self.memory_used <= self.memory_budget:
+                break
+            if segment.audio is None:
+                continue
+            path = os.path.join(self.spill_dir, f"spill-{uuid.uuid4().hex[:10]}.wav")
+            segment.audio.export(path, format="wav")
+            self.memory_used -= segment.nbytes
+            # The path is set first, as a live stream may be reading the segment
+            segment.path, segment.temporary = path, True
+            segment.audio = None
+
+    def clear(self):
+        """
+        Removes every segment and deletes the temporary files
+        """
+        for segment in self.segments:
+            if segment.temporary and os.path.exists(segment.path):
+                os.remove(segment.path)
+        self.segments = []
+        self.memory_used = 0
+
+
+class _Encoder:
+    """
+    One ffmpeg process encoding the broadcast's PCM into an mp3
+    The tags and cover art are written ahead of the audio, and every write
+    is flushed to ffmpeg, so dest can be played while it is still growing.
+    Without a dest, the mp3 is written to stdout; realtime reads the PCM at
+    playback speed.
+    """
+
+    def __init__(self, dest, poster_path, tags, realtime=False):
+        self.command = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+        if realtime:
+            self.command.append("-re")
+        self.command += [
+            # PCM of the timeline on stdin
+            "-f",
+            f"s{8 * AUDIO['sample_width']}le",
+            "-ar",
+            str(AUDIO["sample_rate"]),
+            "-ac",
+            str(AUDIO["channels"]),
+            "-i",
+            "-",
+            "-i",
+            poster_path,
+            "-map",
+            "0:a",
+            "-map",
+            "1:v",
+            "-c:a",
+            "libmp3lame",
+            "-b:a",
+            AUDIO["bitrate"],
+            "-c:v",
+            "copy",
+            "-id3v2_version",
+            "3",
+            "-metadata:s:v",
+            "title=Album cover",
+            "-metadata:s:v",
+            "comment=Cover (front)",
+            "-flush_packets",
+            "1",
+        ]
+        for key, value in tags.items():
+            self.command += ["-metadata", f"{key}={value}"]
+        if dest is None:
+            self.command += ["-f", "mp3", "pipe:1"]
+            stdout = subprocess.PIPE
+        else:
+            self.command.append(dest)
+            stdout = None
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=stdout
+        )
+
+    def write(self, pcm):
+        self.process.stdin.write(pcm)
+
+    def flush(self):
+        self.process.stdin.flush()
+
+    def close(self):
+        """
+        Finishes the mp3 and waits for ffmpeg to exit
+        """
+        try:
+            self.process.stdin.close()
+        finally:
+            self.process.wait()
+        if self.process.returncode != 0:
+            raise subprocess.CalledProcessError(self.process.returncode, self.command)
+
+
+def _speech_key(text, length_scale=1.0):
+    """
+    Cache key for a speech clip
+    """
+    return _ClipCache.key(
+        text=text,
+        speaker=TTS["speaker_name"],
+        model=TTS["model_name"],
+        style_wav="",
+        length_scale=length_scale,
+    )
+
+
+@contextlib.contextmanager
+def _speaking_rate(synthesizer, length_scale):
+    """
+    Sets the duration scale of the model (> 1 is slower) while synthesizing
+    Yields False if the model has no control over its speaking rate
+    """
+    model = synthesizer.tts_model
+    if not hasattr(model, "length_scale"):
+        yield False
+        return
+    default_scale = model.length_scale
+    model.length_scale = length_scale
+    try:
+        yield True
+    finally:
+        model.length_scale = default_scale
+
+
+def _wav_to_audio(wav, sample_rate):
+    """
+    Converts a synthesized waveform to 16-bit PCM,
+    normalized the same way as Synthesizer.save_wav
+    """
+    wav = numpy.asarray(wav, dtype=numpy.float32)
+    wav_norm = wav * (32767 / max(0.01, numpy.max(numpy.abs(wav))))
+    return AudioSegment(
+        wav_norm.astype(numpy.int16).tobytes(),
+        frame_rate=sample_rate,
+        sample_width=2,
+        channels=1,
+    )
+
+
+def _synthesize(synthesizer, text, speaker=None, length_scale=1.0):
+    """
+    Synthesizes the text with the given synthesizer
+    """
+    speaker = TTS["speaker_name"] if speaker is None else speaker
+    with _SuppressTTSLogs(), _speaking_rate(synthesizer, length_scale) as native:
+        wavs = synthesizer.tts(text, speaker_name=speaker, style_wav="")
+    audio = _wav_to_audio(wavs, synthesizer.output_sample_rate)
+    if not native and length_scale != 1.0:
+        audio = _change_tempo(audio, 1 / length_scale)
+    return audio
+
+
+def _synthesize_batch(synthesizer, texts, length_scale=1.0):
+    """
+    Synthesizes several texts in a single forward pass of the VITS model
+    Like Synthesizer.tts, every text is split into sentences, each of which
+    has its trailing silence trimmed and is followed by a pause of 10000
+    samples. The sentences of all the texts are padded to the longest one
+    and the output waveforms are cut back to their real lengths using the
+    model's output mask.
+    Returns a clip for every text, made the same way as by _synthesize
+    """
+    import torch
+
+    model = synthesizer.tts_model
+    sentences = [synthesizer.split_into_sentences(text) for text in texts]
+    tokens = [model.tokenizer.text_to_ids(s) for group in sentences for s in group]
+    lengths = torch.tensor([len(ids) for ids in tokens], dtype=torch.long)
+    padded = torch.zeros((len(tokens), int(lengths.max())), dtype=torch.long)
+    for row, ids in enumerate(tokens):
+        padded[row, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+    speaker_id = model.speaker_manager.name_to_id[TTS["speaker_name"]]
+    speaker_ids = torch.full((len(tokens),), speaker_id, dtype=torch.long)
+    device = next(model.parameters()).device
+    with torch.no_grad(), _speaking_rate(synthesizer, length_scale) as native:
+        outputs = model.inference(
+            padded.to(device),
+            aux_input={
+                "x_lengths": lengths.to(device),
+                "speaker_ids": speaker_ids.to(device),
+            },
+        )
+    # Every frame of the output mask is hop_length samples of audio
+    frames = outputs["y_mask"].sum(dim=(1, 2)).long().cpu()
+    samples = frames * model.config.audio.hop_length
+    waveforms = outputs["model_outputs"].squeeze(1).cpu().numpy()
+
+    audio_config = synthesizer.tts_config.audio
+    trim = "do_trim_silence" in audio_config and audio_config["do_trim_silence"]
+    pause = numpy.zeros(10000, dtype=numpy.float32)
+    clips, row = [], 0
+    for group in sentences:
+        wav = [numpy.zeros(0, dtype=numpy.float32)]
+        for _ in group:
+            waveform = waveforms[row, : int(samples[row])]
+            if trim:  # as TTS's trim_silence
+                waveform = waveform[: model.ap.find_endpoint(waveform)]
+            wav += [waveform, pause]
+            row += 1
+        audio = _wav_to_audio(numpy.concatenate(wav), synthesizer.output_sample_rate)
+        if not native and length_scale != 1.0:
+            audio = _change_tempo(audio, 1 / length_scale)
+        clips.append(audio)
+    return clips
+
+
+def _change_tempo(audio, tempo):
+    """
+    Changes the tempo of the speech
+    Only used for models which cannot change their speaking rate themselves
+    as it costs an extra ffmpeg pass
+    """
+    pcm = ["-f", "s16le", "-ar", str(audio.frame_rate), "-ac", str(audio.channels)]
+    retime = FFmpeg(
+        global_options=["-hide_banner", "-loglevel", "error"],
+        inputs={"pipe:0": pcm},
+        outputs={"pipe:1": ["-filter:a", f"atempo={tempo}"] + pcm},
+    )
+    stdout, _ = retime.run(
+        input_data=audio.set_sample_width(2).raw_data, stdout=subprocess.PIPE
+    )
+    return AudioSegment(
+        stdout,
+        frame_rate=audio.frame_rate,
+        sample_width=2,
+        channels=audio.channels,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _background_bed(path, volume):
+    """
+    Samples of the background music at its reduced volume, in the broadcast's
+    rate and channels
+    Decoded once per process, as every announcement is overlaid on it
+    """
+    background = _conform(AudioSegment.from_wav(path))
+    background = _gain(background, -25 * (1 / volume))  # reduce the volume
+    background.flags.writeable = False
+    return background
+
+
+def _add_background_music(speech):
+    """
+    Overlays the speech on the background music
+    """
+    background = _background_bed(PATH["backg_music"], TTS["backg_music_vol"])
+    offset = 4 * AUDIO["sample_rate"]  # the speech starts 4 seconds in
+    mixed = _overlay(background, _conform(speech), offset)
+    return _to_segment(mixed, AUDIO["sample_rate"])
+
+
+# Per-process state of the TTS worker pool
+_WORKER = {}
+
+
+def _init_tts_worker(num_threads):
+    """
+    Loads the synthesizer once in every TTS worker process
+    Limiting torch's threads prevents the workers from oversubscribing the cores
+    """
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _WORKER["synthesizer"] = Dialogue.init_speech()
+    _WORKER["cache"] = _ClipCache(PATH["tts_cache"], TTS["cache_size_mb"] * 1024 * 1024)
+
+
+def _render_speech(text, length_scale, background):
+    """
+    Runs in a TTS worker: synthesizes (or fetches from the cache) a clip
+    and adds the background music to it if needed
+    Returns whether it was a cache hit, the clip, and the number of sample rate
+    conversions it took (as they are counted in the worker's process)
+    """
+    resamples = _RESAMPLES["count"]
+    key = _speech_key(text, length_scale)
+    audio = _WORKER["cache"].load(key)
+    hit = audio is not None
+    if not hit:
+        audio = _synthesize(_WORKER["synthesizer"], text, length_scale=length_scale)
+        _WORKER["cache"].store(key, audio)
+    if background:
+        audio = _add_background_music(audio)
+    return hit, audio, _RESAMPLES["count"] - resamples
+
+
+class _SynthesisHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the newline-delimited JSON requests of a synthesizer daemon client
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except Exception as error:  # reported back to the client
+                response = {"ok": False, "error": repr(error)}
+            self.wfile.write(json.dumps(response).encode("UTF-8") + b"\n")
+
+
+class SynthesisServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived synthesizer daemon which keeps the TTS model warm across broadcasts
+    Every client connection is served on its own thread.
+    Clients send one JSON object per line:
+        {"op": "tts", "text": ..., "speaker": ..., "length_scale": ...}
+        {"op": "health"}
+    The synthesized speech is sent back as a base64-encoded WAV, so the daemon
+    never writes to paths chosen by its clients.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, synthesizer):
+        self.synthesizer = synthesizer
+        # The model is not thread-safe, so synthesis is serialized
+        self.model_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.started = time.time()
+        self.served, self.total_latency, self.last_latency = 0, 0.0, None
+        super().__init__(socket_path, _SynthesisHandler)
+
+    def dispatch(self, request):
+        """
+        Runs a single client request
+        """
+        if request["op"] == "health":
+            with self.stats_lock:
+                mean = self.total_latency / self.served if self.served else None
+                return {
+                    "ok": True,
+                    "model": TTS["model_name"],
+                    "uptime": time.time() - self.started,
+                    "requests": self.served,
+                    "mean_latency": mean,
+                    "last_latency": self.last_latency,
+                }
+        if request["op"] == "tts":
+            start = time.time()
+            with self.model_lock:
+                audio = _synthesize(
+                    self.synthesizer,
+                    request["text"],
+                    request.get("speaker"),
+                    request.get("length_scale", 1.0),
+                )
+            wav = io.BytesIO()
+            audio.export(wav, format="wav")
+            latency = time.time() - start
+            with self.stats_lock:
+                self.served += 1
+                self.total_latency += latency
+                self.last_latency = latency
+            return {
+                "ok": True,
+                "latency": latency,
+                "wav": base64.b64encode(wav.getvalue()).decode("ascii"),
+            }
+        raise ValueError(f"Unknown request: {request['op']}")
+
+
+def _daemon_request(request, timeout=None):
+    """
+    Sends a request to the synthesizer daemon and returns its response
+    Raises OSError if the daemon is not running
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(TTS["daemon_timeout"] if timeout is None else timeout)
+        client.connect(TTS["daemon_socket"])
+        client.sendall(json.dumps(request).encode("UTF-8") + b"\n")
+        with client.makefile("rb") as stream:
+            line = stream.readline()
+    if not line:
+        raise ConnectionError("Synthesizer daemon closed the connection")
+    response = json.loads(line)
+    if not response["ok"]:
+        raise RuntimeError(f"Synthesizer daemon failed: {response['error']}")
+    return response
+
+
+def serve_tts():
+    """
+    Runs the synthesizer daemon until it is interrupted
+    """
+    socket_path = TTS["daemon_socket"]
+    if os.path.exists(socket_path):
+        try:
+            _daemon_request({"op": "health"}, timeout=1)
+            logging.error(f"A synthesizer daemon is already serving {socket_path}.")
+            return 1
+        except (OSError, ValueError):
+            # Left behind by a daemon which did not shut down cleanly
+            os.remove(socket_path)
+    synthesizer = Dialogue.init_speech()
+    with SynthesisServer(socket_path, synthesizer) as server:
+        logging.info(f"Synthesizer daemon listening on {socket_path}.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Shutting down the synthesizer daemon.")
+        finally:
+            os.remove(socket_path)
+    return 0
+
+
+class _BroadcastHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Streams the live broadcast to one listener
+    """
+
+    def do_GET(self):
+        if self.path not in ("/", "/stream.mp3"):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("icy-name", TTS["station_name"])
+        self.end_headers()
+        listener = self.server.listen()
+        try:
+            for chunk in iter(listener.get, None):
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.leave(listener)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+class BroadcastServer(http.server.ThreadingHTTPServer):
+    """
+    Serves a broadcast as a continuous mp3 stream while it is being generated
+    Published segments are queued for a feeder thread, which writes them to
+    one ffmpeg process reading at playback speed. Its output is shared by
+    every listener and archived to dest. At most `ahead` segments are queued,
+    so publishing blocks once generation is that far ahead of playback.
+    Listeners which fall too far behind are disconnected.
+    If a segment can not be written, the stream stops and the error is raised
+    by the next publish (or finish).
+    """
+
+    daemon_threads = True
+    # Chunks buffered for a listener before it is disconnected
+    listener_backlog = 256
+    # Seconds between checks for a failed feeder while the queue is full
+    poll_interval = 0.5
+
+    def __init__(self, address, ahead, dest):
+        self.dest = dest
+        self.segments = queue.Queue(maxsize=ahead)
+        self.listeners = set()
+        self.listeners_lock = threading.Lock()
+        self.finished = False
+        self.encoder = None
+        self.threads = []
+        # Set by the feeder thread when it fails
+        self.error = None
+        super().__init__(address, _BroadcastHandler)
+
+    def start(self, poster_path, tags):
+        """
+        Starts the encoder and begins serving listeners
+        """
+        self.encoder = _Encoder(None, poster_path, tags, realtime=True)
+        for target in (self.feed, self.fan_out, self.serve_forever):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def publish(self, segment):
+        """
+        Queues a segment to be played, waiting while the queue is full
+        """
+        self.put(segment)
+
+    def finish(self):
+        """
+        Plays the queued segments, then ends the stream for every listener
+        """
+        try:
+            self.put(None)
+        finally:
+            feeder, fan_out, _ = self.threads
+            feeder.join()
+            fan_out.join()
+            try:
+                self.encoder.close()
+            finally:
+                self.shutdown()
+                self.server_close()
+        if self.error is not None:
+            raise self.error
+
+    def put(self, item):
+        """
+        Queues an item for the feeder, waiting while the queue is full
+        Raises the feeder's error if it failed, as the queue is no longer read
+        """
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.segments.put(item, timeout=self.poll_interval)
+                return
+            except queue.Full:
+                pass
+
+    def feed(self):
+        """
+        Writes the queued segments to the encoder
+        """
+        try:
+            for segment in iter(self.segments.get, None):
+                _write_pcm(segment, self.encoder.write)
+        except Exception as error:  # raised by the next publish
+            logging.error(f"Streaming the broadcast failed ({error!r}).")
+            self.error = error
+        finally:
+            with contextlib.suppress(BrokenPipeError):
+                self.encoder.process.stdin.close()
+
+    def fan_out(self):
+        """
+        Copies the encoder's output to the archive and every listener
+        """
+        stdout = self.encoder.process.stdout
+        with open(self.dest, "wb") as archive:
+            for chunk in iter(lambda: stdout.read1(65536), b""):
+                archive.write(chunk)
+                with self.listeners_lock:
+                    for listener in list(self.listeners):
+                        try:
+                            listener.put_nowait(chunk)
+                        except queue.Full:
+                            logging.warning("Dropping a listener that fell behind.")
+                            self.drop(listener)
+        with self.listeners_lock:
+            self.finished = True
+            for listener in list(self.listeners):
+                self.drop(listener)
+
+    def listen(self):
+        """
+        Registers a listener, which receives the stream from now on
+        """
+        listener = queue.Queue(maxsize=self.listener_backlog)
+        with self.listeners_lock:
+            if self.finished:
+                listener.put(None)
+            else:
+                self.listeners.add(listener)
+        return listener
+
+    def leave(self, listener):
+        """
+        Unregisters a listener which has disconnected
+        """
+        with self.listeners_lock:
+            self.listeners.discard(listener)
+
+    def drop(self, listener):
+        """
+        Ends the stream of a listener (the caller holds listeners_lock)
+        """
+        self.listeners.discard(listener)
+        with contextlib.suppress(queue.Empty):
+            while True:
+                listener.get_nowait()
+        listener.put_nowait(None)
+
+
+class _GenreIndex:
+    """
+    Inverted index from every tag of the song dataset to its songs
+    It is built once from the CSV (and rebuilt whenever the CSV's mtime
+    changes) into NumPy arrays in index_dir, which are memory-mapped:
+        strings.npy, offsets.npy: every artist and title, stored only once
+        songs.npy: the (artist, title) string ids of every song
+        postings.npy: song ids, grouped by tag
+        tags.json: where each tag's song ids are in postings, and the mtime
+    """
+
+    def __init__(self, csv_path, index_dir):
+        self.csv_path = csv_path
+        self.index_dir = index_dir
+        # mtime of the CSV the loaded index was built from
+        self.mtime = None
+
+    @staticmethod
+    def parse_tags(tags):
+        """
+        Exact tags of a song, whether stored as a list or as the string of one
+        """
+        if isinstance(tags, str):
+            tags = tags.strip("[]").split(",")
+        elif not isinstance(tags, (list, tuple)):
+            # Songs without any tags
+            return set()
+        tags = (tag.strip().strip("'\"").strip().lower() for tag in tags)
+        return {tag for tag in tags if tag}
+
+    def path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def save(self, name, data):
+        """
+        Writes an index file
+        """
+        if isinstance(data, numpy.ndarray):
+            array = io.BytesIO()
+            numpy.save(array, data)
+            data = array.getvalue()
+        else:
+            data = json.dumps(data).encode("UTF-8")
+        _atomic_write(self.path(name), data)
+
+    def build(self, mtime):
+        """
+        Builds the index from the CSV and returns its header
+        """
+        songs = pd.read_csv(self.csv_path, compression="gzip")
+        # Artists and titles are interned, their ids are their positions
+        strings = {}
+        pairs = numpy.array(
+            [
+                (
+                    strings.setdefault(str(artist), len(strings)),
+                    strings.setdefault(str(title), len(strings)),
+                )
+                for artist, title in zip(songs["artist_name"], songs["title"])
+            ],
+            dtype=numpy.int32,
+        ).reshape(-1, 2)
+        by_tag = {}
+        for song_id, tags in enumerate(songs["tags"]):
+            for tag in self.parse_tags(tags):
+                by_tag.setdefault(tag, []).append(song_id)
+        tags, postings = {}, []
+        for tag in sorted(by_tag):
+            tags[tag] = [len(postings), len(postings) + len(by_tag[tag])]
+            postings += by_tag[tag]
+
+        encoded = [string.encode("UTF-8") for string in strings]
+        offsets = numpy.cumsum([0] + [len(string) for string in encoded])
+        blob = numpy.frombuffer(b"".join(encoded), dtype=numpy.uint8)
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.save("strings.npy", blob)
+        self.save("offsets.npy", offsets.astype(numpy.int64))
+        self.save("songs.npy", pairs)
+        self.save("postings.npy", numpy.array(postings, dtype=numpy.int32))
+        # Written last, so a partly written index is rebuilt
+        header = {"mtime": mtime, "tags": tags}
+        self.save("tags.json", header)
+        return header
+
+    def load(self):
+        """
+        Memory-maps the index, building it first if it is missing or stale
+        """
+        mtime = os.stat(self.csv_path).st_mtime_ns
+        if mtime == self.mtime:
+            return
+        try:
+            with open(self.path("tags.json"), "r", encoding="UTF-8") as file:
+                header = json.load(file)
+        except (OSError, ValueError):
+            header = None
+        if header is None or header["mtime"] != mtime:
+            logging.info("Building the genre index. This happens only once.")
+            header = self.build(mtime)
+        self.tags = header["tags"]
+        for name in ("strings", "offsets", "songs", "postings"):
+            setattr(self, name, numpy.load(self.path(f"{name}.npy"), mmap_mode="r"))
+        self.mtime = mtime
+
+    def string(self, string_id):
+        start, end = self.offsets[string_id], self.offsets[string_id + 1]
+        return bytes(self.strings[start:end]).decode("UTF-8")
+
+    def sample(self, tag, k):
+        """
+        Up to k random songs (artist, title) with the exact tag
+        """
+        self.load()
+        start, end = self.tags.get(tag.strip().lower(), (0, 0))
+        chosen = random.sample(range(start, end), min(k, end - start))
+        return [
+            (self.string(artist), self.string(title))
+            for artist, title in self.songs[self.postings[chosen]]
+        ]
+
+
+class _LocalLibrary:
+    """
+    SQLite index of the local music collections
+    Directories are scanned recursively, and the tags and duration of every
+    audio file are read once with ffprobe. Files are keyed by path, mtime
+    and size, so a rescan only probes the files which changed.
+    """
+
+    extensions = (".mp3", ".flac", ".ogg", ".oga", ".opus", ".m4a", ".aac", ".wav")
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.db = None
+        # Directories already scanned by this instance
+        self.scanned = set()
+
+    def connect(self):
+        """
+        Opens the index (on first use)
+        """
+        if self.db is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(self.db_path)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS songs (path TEXT PRIMARY KEY, "
+                "mtime INTEGER, size INTEGER, artist TEXT, album TEXT, title TEXT, "
+                "duration REAL)"
+            )
+        return self.db
+
+    @staticmethod
+    def pattern(root):
+        """
+        LIKE pattern for every path under root
+        """
+        root = os.path.join(root, "")
+        return re.sub(r"([\\%_])", r"\\\1", root) + "%"
+
+    @staticmethod
+    def probe(path):
+        """
+        Tags and duration of an audio file, None for the ones it lacks
+        """
+        try:
+            result = subprocess.run(
+                [
+                    "ffprobe",
+                    "-v",
+                    "error",
+                    "-show_entries",
+                    "format=duration:format_tags:stream_tags",
+                    "-of",
+                    "json",
+                    path,
+                ],
+                capture_output=True,
+                check=True,
+            )
+            probed = json.loads(result.stdout)
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            probed = {}
+        # Ogg and FLAC keep their tags on the stream, in any case
+        tags = {}
+        for stream in probed.get("streams", []):
+            tags.update(stream.get("tags", {}))
+        tags.update(probed.get("format", {}).get("tags", {}))
+        tags = {key.lower(): value for key, value in tags.items()}
+        duration = probed.get("format", {}).get("duration")
+        return (
+            tags.get("artist"),
+            tags.get("album"),
+            tags.get("title"),
+            float(duration) if duration else None,
+        )
+
+    def update(self, path, stat, known=None):
+        """
+        Probes and indexes a file, unless it is indexed and unchanged
+        Returns whether the file was probed
+        """
+        if known == (stat.st_mtime_ns, stat.st_size):
+            return False
+        self.db.execute(
+            "INSERT OR REPLACE INTO songs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_mtime_ns, stat.st_size, *self.probe(path)),
+        )
+        return True
+
+    def scan(self, root):
+        """
+        Indexes the audio files under root (once per instance)
+        Files which no longer exist are removed from the index
+        """
+        root = os.path.abspath(root)
+        if root in self.scanned:
+            return
+        db = self.connect()
+        known = {
+            path: (mtime, size)
+            for path, mtime, size in db.execute(
+                "SELECT path, mtime, size FROM songs WHERE path LIKE ? ESCAPE '\\'",
+                (self.pattern(root),),
+            )
+        }
+        probed = 0
+        with db:
+            for directory, _, names in os.walk(root):
+                for name in names:
+                    if os.path.splitext(name)[1].lower() not in self.extensions:
+                        continue
+                    path = os.path.join(directory, name)
+                    probed += self.update(path, os.stat(path), known.pop(path, None))
+            # Whatever is left was deleted
+            db.executemany("DELETE FROM songs WHERE path = ?", [(p,) for p in known])
+        self.scanned.add(root)
+        logging.info(f"Indexed {root}, {probed} new or changed files.")
+
+    def sample(self, root, k, artist=None, album=None):
+        """
+        Up to k random songs under root, optionally by an artist or from an album
+        """
+        self.scan(root)
+        query = "SELECT path FROM songs WHERE path LIKE ? ESCAPE '\\'"
+        params = [self.pattern(os.path.abspath(root))]
+        if artist is not None:
+            query += " AND artist = ? COLLATE NOCASE"
+            params.append(artist)
+        if album is not None:
+            query += " AND album = ? COLLATE NOCASE"
+            params.append(album)
+        query += " ORDER BY RANDOM() LIMIT ?"
+        return [path for (path,) in self.db.execute(query, (*params, k))]
+
+    def tags(self, path):
+        """
+        Artist and title of an audio file, which is indexed first if needed
+        """
+        path = os.path.abspath(path)
+        db = self.connect()
+        known = db.execute(
+            "SELECT mtime, size FROM songs WHERE path = ?", (path,)
+        ).fetchone()
+        with db:
+            self.update(path, os.stat(path), known)
+        return db.execute(
+            "SELECT artist, title FROM songs WHERE path = ?", (path,)
+        ).fetchone()
+
+
 class Recommend:
     """
     Recommends content for the radio personality
@@ -87,6 +1948,15 @@ class Recommend:
         musicbrainzngs.set_useragent(
             "phoenix10.1", "1", "https://github.com/pncnmnp/phoenix10.1"
         )
+        # musicbrainzngs lets one request through at a time, the bucket
+        # keeps to the same rate while letting requests overlap
+        musicbrainzngs.set_rate_limit(False)
+        self.musicbrainz = _TokenBucket(
+            AUDIO["musicbrainz_requests_per_sec"], AUDIO["musicbrainz_burst"]
+        )
+        self.discography_cache = _MetadataCache(PATH["discography_cache"])
+        self.genre_index = _GenreIndex(PATH["songdata"], PATH["genre_index"])
+        self.local_library = _LocalLibrary(PATH["local_library"])
 
     def title(self):
         """
@@ -138,28 +2008,46 @@ class Recommend:
         List of genres supported:
             https://gist.github.com/pncnmnp/755341a694022c6b8679b1847922c62f
         """
-        songs = pd.read_csv(PATH["songdata"], compression="gzip")
-        by_genre = songs[songs.apply(lambda song: genre in song["tags"], axis=1)]
-        relevant_songs = list(
-            by_genre[["artist_name", "title"]].itertuples(index=False, name=None)
-        )
-        random.shuffle(relevant_songs)
-        return relevant_songs[: int(num_songs)]
+        return self.genre_index.sample(genre, int(num_songs))
 
     def artist_discography(self, artist_name, num_songs=10):
         """
         Recommends music given an artist name
-        """
-        titles = set()
-        for offset in range(0, 200, 25):
-            discography = musicbrainzngs.search_recordings(
-                artistname=artist_name, offset=offset
+        Recordings are fetched a page at a time until there are a few times
+        more titles than needed to choose from, and are cached per artist
+        for discography_ttl_hours.
+        """
+        num_songs = int(num_songs)
+        query = _MusicLibrary.name(artist_name, None)
+        cached = self.discography_cache.get(query)
+        if cached is None or time.time() - cached["fetched"] > (
+            AUDIO["discography_ttl_hours"] * 3600
+        ):
+            cached = {"fetched": time.time(), "titles": [], "offset": 0, "count": 200}
+        titles = set(cached["titles"])
+        offset = cached["offset"]
+        fetched = False
+        # At most 200 recordings, the most relevant ones come first
+        while len(titles) < 4 * num_songs and offset < min(cached["count"], 200):
+            discography = _rate_limited(
+                lambda: musicbrainzngs.search_recordings(
+                    artistname=artist_name, limit=100, offset=offset
+                ),
+                self.musicbrainz,
+                AUDIO["metadata_retries"],
+                AUDIO["metadata_backoff"],
             )
             for record in discography["recording-list"]:
                 titles.add(record["title"])
+            offset += 100
+            cached["count"] = int(discography.get("recording-count", 0))
+            fetched = True
+        if fetched:
+            cached.update(titles=sorted(titles), offset=offset)
+            self.discography_cache.put(query, cached)
         titles = list(titles)
         random.shuffle(titles)
-        return titles[: int(num_songs)]
+        return titles[:num_songs]
 
     def billboard(self, chart, num_songs=3):
         """
@@ -170,15 +2058,14 @@ class Recommend:
         random.shuffle(songs)
         return songs[: int(num_songs)]
 
-    def local_music(self, path, num_songs):
+    def local_music(self, path, num_songs, filters=None):
         """
-        Recommends music from the local music directory
+        Recommends music from the local music directory (and its subdirectories)
+        filters can narrow the songs down by "artist" and "album"
         """
         path = os.path.expanduser(path)
         if os.path.isdir(path):
-            songs = glob.glob(path + "/*.mp3")
-            random.shuffle(songs)
-            return songs[: int(num_songs)]
+            return self.local_library.sample(path, int(num_songs), **(filters or {}))
         elif os.path.isfile(path) and num_songs == 1:
             return [path]
         else:
@@ -318,7 +2205,6 @@ class Dialogue:
             self.schema = json.load(file)
         with open(PATH["phones"], "r", encoding="UTF-8") as file:
             self.phones = json.load(file)
-        self.index = 0
         # Used to store intermediate audio clips
         if audio_dir is None:
             self.audio_dir = "./" + uuid.uuid4().hex[:10]
@@ -326,6 +2212,41 @@ class Dialogue:
         else:
             self.audio_dir = audio_dir
             os.makedirs(self.audio_dir, exist_ok=True)
+        self.timeline = _Timeline(
+            self.audio_dir, AUDIO["memory_budget_mb"] * 1024 * 1024
+        )
+        self.clip_cache = _ClipCache(
+            PATH["tts_cache"], TTS["cache_size_mb"] * 1024 * 1024
+        )
+        self.library = _MusicLibrary(
+            PATH["music_library"], AUDIO["library_size_mb"] * 1024 * 1024
+        )
+        self.metadata_cache = _MetadataCache(PATH["metadata_cache"])
+        # The pauses and clips found in every podcast episode scanned
+        self.episodes = _EpisodeCache(
+            PATH["episode_cache"], AUDIO["episode_cache_mb"] * 1024 * 1024
+        )
+        self.feeds = _FeedCache(
+            PATH["feed_cache"],
+            (AUDIO["podcast_connect_timeout"], AUDIO["podcast_read_timeout"]),
+        )
+        # Shared by every iTunes search of this broadcast
+        self.itunes = _TokenBucket(
+            AUDIO["metadata_requests_per_min"] / 60, AUDIO["metadata_burst"]
+        )
+        self.pool = None
+        # Prefetches songs (created on first use)
+        self.downloads = None
+        # Whether a synthesizer daemon is serving (None until checked)
+        self.use_daemon = None
+        self.encoder = None
+        self.server = None
+        self.published = 0
+        self.started = time.perf_counter()
+        self.time_to_first_audio = None
+        # Sample rate conversions made for the last broadcast
+        self.resamples = 0
+        self.worker_resamples = 0
 
     def wakeup(self):
         """
@@ -427,63 +2348,83 @@ class Dialogue:
 
     def music(self, song, artist):
         """
-        Fetches a song
+        Fetches a song from the music library, or downloads it on a miss
+        Returns the path of the song, or None if the download failed
         """
-        args = ytmdl.main.arguments()
-        args.SONG_NAME = [song]
-        if artist:
-            args.artist = artist
-        args.choice = 1
-        args.quiet = True
+        path = self.library.find(artist, song)
+        if path is not None:
+            logging.info(f"Found {song} in the music library.")
+            return path
+        args = _ytmdl_arguments(song, artist)
         url, _ = ytmdl.core.search(args.SONG_NAME[0], args)
+        path = self.library.find(artist, song, url=url)
+        if path is not None:
+            logging.info(f"Found {song} in the music library.")
+            return path
         logging.info(f"Fetching song from {url}.")
 
-        # Download the song with metadata
+        # Songs are downloaded in parallel, so each one gets its own directory
+        song_dir = f"{self.audio_dir}/songs/{uuid.uuid4().hex[:10]}"
+        os.makedirs(song_dir)
+        # The audio stream is kept as it is (it is decoded once, when the
+        # broadcast is rendered) and the metadata comes from the info dict
         ydl_opts = {
             "format": "bestaudio/best",
-            "postprocessors": [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                },
-                {"key": "FFmpegMetadata"},
-            ],
-            "outtmpl": f"{self.audio_dir}/%(title)s.%(ext)s",
+            "outtmpl": f"{song_dir}/%(id)s.%(ext)s",
         }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            error_code = ydl.download([url])
-            if error_code != 0:
-                return 1
-        mp3 = glob.glob(f"{self.audio_dir}/*.mp3")[0]
-        os.rename(mp3, f"{self.audio_dir}/song.mp3")
-        return 0
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=True)
+        except yt_dlp.utils.DownloadError:
+            return None
+        source = {
+            "artist": info.get("artist") or info.get("creator") or info.get("uploader"),
+            "title": info.get("track") or info.get("title"),
+        }
+        song_path = info["requested_downloads"][0]["filepath"]
+        return self.library.store(url, artist, song, song_path, source)
+
+    def prefetch(self, songs):
+        """
+        Starts downloading the songs in parallel (see download_workers)
+        Returns a future for every song, in schedule order
+        """
+        if self.downloads is None:
+            self.downloads = ThreadPoolExecutor(
+                max_workers=AUDIO["download_workers"], thread_name_prefix="download"
+            )
+        logging.info(f"Prefetching {len(songs)} songs.")
+        return [
+            self.downloads.submit(self.music, song, artist) for artist, song in songs
+        ]
 
-    def postprocess_music(self, song, is_local):
+    def downloaded(self, song, download):
         """
-        Generate the wav file for music and sandwich it between the intro and outro
+        Waits for a prefetched song and returns its path
+        Failures are logged and return None, so the show can go on without it
         """
-        song_path = song if is_local else f"{self.audio_dir}/song.mp3"
-        sound = AudioSegment.from_mp3(song_path)
+        try:
+            path = download.result()
+        except Exception as error:
+            logging.warning(f"Failed to download {song} ({error}). Skipping.")
+            return None
+        if path is None:
+            logging.warning(f"Failed to download {song}. Skipping.")
+        return path
 
-        # Rename the previous outro file to current index
-        # as the previous outro index will be used for this song
-        # This ensures that the song is sandwiched between intro and outro
-        # NOTE: index - 1 is a silence clip
-        os.rename(
-            f"{self.audio_dir}/a{self.index - 2}.wav",
-            f"{self.audio_dir}/a{self.index}.wav",
-        )
-        sound.export(f"{self.audio_dir}/a{self.index - 2}.wav", format="wav")
-        self.index += 1
-        if not is_local:
-            os.remove(song_path)
+    def postprocess_music(self, path):
+        """
+        Sandwich the song between the intro and outro
+        The song is only referenced here and decoded when the broadcast is rendered
+        """
+        # NOTE: The last two segments are the outro and a silence
+        self.timeline.add(_Segment(path=path), position=len(self.timeline) - 2)
 
     def podcast_dialogue(self, rss_feed, start=True):
         """
         Speech for a podcast
         """
-        parsed = podcastparser.parse(rss_feed, urllib.request.urlopen(rss_feed))
+        parsed = self.feeds.get(rss_feed)
         if start:
             speech = (
                 "You know, I love listening to podcasts. "
@@ -508,139 +2449,210 @@ class Dialogue:
     def podcast_clip(self, rss_feed, duration):
         """
         Fetches an interesting clip from the podcast
+        Clips are cached per episode, so the latest episode is only scanned
+        once. When it has no clip of the right length (or can not be
+        downloaded), older episodes analyzed before are tried, offline.
         """
-        # Download the podcast
-        parsed = podcastparser.parse(rss_feed, urllib.request.urlopen(rss_feed))
+        parsed = self.feeds.get(rss_feed)
         logging.info(
             f"Finding a relevant clip from podcast - {parsed['title']} from {parsed['itunes_author']}."
         )
-        podcast_link = parsed["episodes"][0]["enclosures"][0]["url"]
-        audio_file = f"{self.audio_dir}/a{self.index}.mp3"
-        subprocess.run(
-            [
-                "yt-dlp",
-                "--extract-audio",
-                "--audio-format",
-                "mp3",
-                "--max-downloads",
-                "1",
-                f"{podcast_link}",
-                "--output",
-                f"{audio_file}",
-            ],
-            check=False,
-        )
-
-        # Find out sections of podcast which have a long pause
-        # This will help us split the podcast into pieces
-        # Logic is from mxl: https://stackoverflow.com/a/57126101
-        # Licensed under CC BY-SA 4.0
-        # Pydub is way slow for this task
-        silence_timestamps = []
+        episodes = [episode for episode in parsed["episodes"] if episode["enclosures"]]
         duration_sec = duration * 60
-        silence_duration = 1.1
-        threshold = int(float(0.1 * 65535))
-        sampling_rate = 22050
-        threshold_sampling_rate = silence_duration * sampling_rate
-        buffer_length = int(threshold_sampling_rate * 2)
-
-        # dummy array for the first chunk
-        prev_arr = numpy.arange(1, dtype="int16")
-        position, prev_position = 0, 0
-        pipe = subprocess.Popen(
+        clip = self.episode_clip(episodes[0], duration_sec)
+        if clip is None or not clip["qualifies"]:
+            for episode in episodes[1:]:
+                older = self.episode_clip(episode, duration_sec, offline=True)
+                if older is not None and older["qualifies"]:
+                    logging.info(
+                        f"Using a clip from an older episode, {episode['title']}."
+                    )
+                    clip = older
+                    break
+        if clip is None:
+            logging.warning("No podcast clip could be fetched.")
+            return
+
+        self.timeline.add(_Segment(audio=clip["audio"]))
+        self.silence()
+
+    def episode_clip(self, episode, duration_sec, offline=False):
+        """
+        The clip of an episode and whether it is long enough to qualify
+        (see scan_podcast), or None when there is none
+        Episodes are keyed by enclosure URL and length. Clips cut before come
+        from the episode cache. Otherwise, the cut is picked from the pauses
+        found before when they hold a clip which qualifies (or the whole
+        episode was scanned), and only the clip is fetched. Other episodes
+        are downloaded and scanned. Nothing is fetched when offline.
+        """
+        enclosure = episode["enclosures"][0]
+        url, length = enclosure["url"], max(enclosure.get("file_size", 0), 0)
+        episode_key = _ClipCache.key(url=url, length=length)
+        clip_key = _ClipCache.key(
+            url=url,
+            length=length,
+            duration=duration_sec,
+            sample_rate=AUDIO["sample_rate"],
+            channels=AUDIO["channels"],
+            sample_width=AUDIO["sample_width"],
+        )
+        analysis = self.episodes.analysis(episode_key)
+        if analysis is None:
+            analysis = {"pauses": [], "complete": False, "clips": {}}
+        if str(duration_sec) in analysis["clips"]:
+            audio = self.episodes.load(clip_key)
+            if audio is not None:
+                *_, qualifies = analysis["clips"][str(duration_sec)]
+                return {"audio": audio, "qualifies": qualifies}
+        if offline:
+            return None
+
+        max_samples = int(duration_sec * _SCAN_RATE)
+        enough = AUDIO["podcast_min_clip"] * max_samples
+        clip = _longest_clip(analysis["pauses"], max_samples)
+        timeout = (AUDIO["podcast_connect_timeout"], AUDIO["podcast_read_timeout"])
+        if analysis["complete"] or (clip is not None and clip[1] - clip[0] >= enough):
+            logging.info("Cutting the podcast clip at the pauses found before.")
+            audio_file = None
+        else:
+            extension = os.path.splitext(urllib.parse.urlparse(url).path)[1]
+            audio_file = f"{self.audio_dir}/podcast{extension or '.mp3'}"
+            pauses, complete, downloaded = self.scan_podcast(
+                url, audio_file, duration_sec
+            )
+            if not downloaded:
+                os.remove(audio_file)
+                return None
+            analysis["pauses"], analysis["complete"] = pauses, complete
+            clip = _longest_clip(pauses, max_samples)
+        if clip is not None:
+            start, end = clip[0] / _SCAN_RATE, clip[1] / _SCAN_RATE
+        else:
+            # If no silence is found, just take the first "duration" minutes
+            logging.warning(
+                "No relevant podcast clip found. "
+                f"Using the first {duration_sec / 60:g} minutes."
+            )
+            start, end = 0, duration_sec
+        # Only the clip is decoded, straight into the broadcast's format
+        if audio_file is None:
+            audio = _decode_window(url, start * 1000, end * 1000, max(timeout))
+        else:
+            audio = _decode_window(audio_file, start * 1000, end * 1000)
+            os.remove(audio_file)
+
+        qualifies = clip is not None and clip[1] - clip[0] >= enough
+        self.episodes.store(clip_key, audio)
+        analysis["clips"][str(duration_sec)] = [start, end, qualifies]
+        self.episodes.analyzed(episode_key, analysis)
+        return {"audio": audio, "qualifies": qualifies}
+
+    def scan_podcast(self, url, audio_file, duration_sec):
+        """
+        Downloads an episode into audio_file while looking for pauses in it
+        The episode is fetched podcast_range_kb at a time and decoded as it
+        arrives. The download stops at the first clip between two pauses
+        that is at least podcast_min_clip of duration_sec (and at most
+        duration_sec) long, or after podcast_scan_mb.
+        Returns the pauses found, as sample offsets at _SCAN_RATE, whether
+        the episode was scanned as far as it will ever be (to its end or to
+        podcast_scan_mb), and the number of bytes downloaded
+        """
+        max_samples = int(duration_sec * _SCAN_RATE)
+        enough = AUDIO["podcast_min_clip"] * max_samples
+        detector = _SilenceDetector(
+            min_samples=int(1.1 * _SCAN_RATE), threshold=int(0.1 * 65535)
+        )
+        decoder = subprocess.Popen(
             [
                 "ffmpeg",
                 "-hide_banner",
                 "-loglevel",
                 "error",
                 "-i",
-                f"{audio_file}",
+                "-",
                 "-f",
                 "s16le",  # PCM signed 16-bit little-endian
                 "-acodec",
                 "pcm_s16le",
                 "-ar",
-                str(sampling_rate),
+                str(_SCAN_RATE),
                 "-ac",
                 "1",  # for mono
                 "-",  # - output to stdout
             ],
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            bufsize=10**8,
         )
+        found, failed = threading.Event(), threading.Event()
+        downloaded = [0]
 
-        while True:
-            raw = pipe.stdout.read(buffer_length)
-            if len(prev_arr) == 0 or raw == "":
-                break
-            curr_arr = numpy.fromstring(raw, dtype="int16")
-            curr_range = numpy.concatenate([prev_arr, curr_arr])
-            maximum = numpy.amax(curr_range)
-            if maximum <= threshold:
-                # pass filter with all samples <= threshold set to 0
-                # and > threshold set to 1
-                trng = (curr_range <= threshold) * 1
-                samples = numpy.sum(trng)
-                # check how many 1's were there
-                if samples >= threshold_sampling_rate:
-                    end_time = position + silence_duration * 0.5
-                    time = (end_time) - prev_position
-                    if time <= duration_sec:
-                        silence_timestamps.append((prev_position, end_time))
-                    prev_position = position + silence_duration * 0.5
-            position += silence_duration
-            prev_arr = curr_arr
-
-        silence_timestamps = sorted(
-            silence_timestamps, key=lambda time: time[1] - time[0], reverse=True
+        def download():
+            try:
+                with open(audio_file, "wb") as f:
+                    for chunk in _fetch_ranges(
+                        url,
+                        AUDIO["podcast_range_kb"] * 1024,
+                        AUDIO["podcast_scan_mb"] * 1024 * 1024,
+                        (
+                            AUDIO["podcast_connect_timeout"],
+                            AUDIO["podcast_read_timeout"],
+                        ),
+                    ):
+                        # The file always holds what the decoder has seen
+                        f.write(chunk)
+                        f.flush()
+                        downloaded[0] += len(chunk)
+                        if found.is_set():
+                            break
+                        decoder.stdin.write(chunk)
+            except BrokenPipeError:
+                pass
+            except requests.RequestException as e:
+                logging.warning(f"Podcast download stopped early: {e}")
+                failed.set()
+            finally:
+                with contextlib.suppress(BrokenPipeError):
+                    decoder.stdin.close()
+
+        downloader = threading.Thread(target=download, daemon=True)
+        downloader.start()
+        pauses = []
+        with decoder:
+            for block in iter(lambda: decoder.stdout.read(1 << 16), b""):
+                pauses += detector.feed(block)
+                clip = _longest_clip(pauses, max_samples)
+                if clip is not None and clip[1] - clip[0] >= enough:
+                    found.set()
+                    decoder.kill()
+                    break
+            else:
+                pauses += detector.close()
+            downloader.join()
+            complete = not found.is_set() and not failed.is_set()
+        logging.info(
+            f"Scanned {downloaded[0] / 1024 / 1024:.1f} MB of the podcast episode."
         )
-        try:
-            optimal_start, optimal_end = silence_timestamps[0]
-            podcast_audio = AudioSegment.from_mp3(audio_file)
-            optimal_clip = podcast_audio[optimal_start * 1000 : optimal_end * 1000]
-        except IndexError:
-            # If no silence is found, just take the first "duration" minutes
-            logging.warning(
-                f"No relevant podcast clip found. Using the first {duration} minutes."
-            )
-            optimal_start, optimal_end = None, None
-            optimal_clip = AudioSegment.from_mp3(audio_file)[: duration_sec * 1000]
-
-        optimal_clip.export(audio_file.replace(".mp3", ".wav"), format="wav")
-        os.remove(audio_file)
-        self.index += 1
-        self.silence()
+        return [list(pause) for pause in pauses], complete, downloaded[0]
 
-    def music_meta(self, song, artist, is_local, start=True):
+    def music_meta(self, song, artist, is_local, start=True, path=None):
         """
-        Fetches metadata for a song
+        Fetches metadata for a song (path is where it was downloaded to)
         NOTE: This is a tough problem to solve for non-local songs
         as the users only enter the song name.
         Currently, it fetches the first song. Needs improvement!
         """
         if is_local:
-            metadata = eyed3.load(song)
-            artist, song = metadata.tag.artist, metadata.tag.title
+            artist, song = self.rec.local_library.tags(song)
             genre = "The next song is from your personal collection. "
         else:
-            fetched_artist = eyed3.load(f"{self.audio_dir}/song.mp3").tag.artist
-
-            # Compare the artist name fetched from song
-            # with artists found from iTunes and choose the most similar one
-            try:
-                itunes_metadata = itunespy.search_track(song, country="US", limit=100)
-            except:
-                logging.warning(
-                    "Metadata search failed. Trying again after 80 seconds."
-                )
-                time.sleep(80)
-                itunes_metadata = itunespy.search_track(song, country="US", limit=100)
-            most_accurate = sorted(
-                [song_info.json for song_info in itunes_metadata],
-                key=lambda song_info: nltk.edit_distance(
-                    song_info["artistName"], fetched_artist
-                ),
-            )[0]
+            # Resolved once per song, then kept in the music library
+            most_accurate = self.library.metadata(path)
+            if most_accurate is None:
+                source = self.library.source(path) or {}
+                most_accurate = self.itunes_metadata(song, source.get("artist"))
+                self.library.annotate(path, most_accurate)
             artist = artist if artist else most_accurate["artistName"]
             song = song if song else most_accurate["trackName"]
             genre = f'The next song is from the world of {most_accurate["primaryGenreName"]}. '
@@ -656,15 +2668,50 @@ class Dialogue:
         )
         return speech
 
+    def itunes_metadata(self, song, fetched_artist):
+        """
+        iTunes metadata of a downloaded song
+        fetched_artist is the artist reported by the site it came from
+        """
+        fetched_artist = fetched_artist or ""
+        query = _MusicLibrary.name(fetched_artist, song)
+        cached = self.metadata_cache.get(query)
+        if cached is not None:
+            return cached
+
+        itunes_metadata = _rate_limited(
+            lambda: itunespy.search_track(song, country="US", limit=100),
+            self.itunes,
+            AUDIO["metadata_retries"],
+            AUDIO["metadata_backoff"],
+        )
+        # Compare the artist name fetched from song
+        # with artists found from iTunes and choose the most similar one
+        most_accurate = _closest_artist(
+            [song_info.json for song_info in itunes_metadata], fetched_artist
+        )
+        if most_accurate is None:
+            raise LookupError(f"No iTunes results for {song}")
+        metadata = {
+            key: most_accurate[key]
+            for key in ("artistName", "trackName", "primaryGenreName")
+        }
+        self.metadata_cache.put(query, metadata)
+        return metadata
+
     def curate_discography(self, action, meta):
         """
         Generates a discography where each element is (artist name, song)
         """
         discography = []
         if action == "music-artist":
-            for artist, num_songs in meta:
-                songs = self.rec.artist_discography(artist, num_songs)
-                discography += [(artist, song) for song in songs]
+            # Artists are looked up concurrently, within the rate limit
+            with ThreadPoolExecutor(max_workers=max(len(meta), 1)) as pool:
+                discographies = pool.map(
+                    lambda entry: self.rec.artist_discography(*entry), meta
+                )
+                for (artist, _), songs in zip(meta, discographies):
+                    discography += [(artist, song) for song in songs]
         elif action == "music-genre":
             for genre, num_songs in meta:
                 songs = self.rec.playlist_by_genre(genre, num_songs)
@@ -700,8 +2747,34 @@ class Dialogue:
         one mp3, and cleaning up the temporary files
         """
         logging.info("Creating a broadcast.")
-        self.synthesizer = self.init_speech()
-        for action, meta in self.schema:
+        self.started = time.perf_counter()
+        self.time_to_first_audio = None
+        resamples = _RESAMPLES["count"]
+        self.worker_resamples = 0
+        # Segments are encoded (or streamed) as each action finishes
+        if AUDIO["stream"]:
+            self.open_broadcast(live=True)
+        elif AUDIO["progressive"]:
+            self.open_broadcast()
+        if TTS["workers"] > 0:
+            self.pool = ProcessPoolExecutor(
+                max_workers=TTS["workers"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_tts_worker,
+                initargs=(TTS["worker_threads"],),
+            )
+        elif not self.daemon_alive():
+            self.synthesizer = self.init_speech()
+        # Songs are downloaded in the background while the show is generated
+        discography = {}
+        for index, (action, meta) in enumerate(self.schema):
+            if action.startswith("music"):
+                songs = self.curate_discography(action, meta)
+                discography[index] = list(zip(songs, self.prefetch(songs)))
+            elif action.startswith("local-music"):
+                songs = self.curate_discography(action, meta)
+                discography[index] = [(song, None) for song in songs]
+        for index, (action, meta) in enumerate(self.schema):
             logging.info(f"Generating {action} segment.")
             speech = None
             if action == "no-ads":
@@ -717,18 +2790,18 @@ class Dialogue:
                 self.speak(speech)
             elif action.startswith("music") or action.startswith("local-music"):
                 is_local = action.startswith("local-music")
-                songs = self.curate_discography(action, meta)
-                for artist, song in songs:
-                    if not is_local:
-                        error = self.music(song, artist)
-                        if error:
-                            logging.warning(f"Failed to download {song}. Skipping.")
+                for (artist, song), download in discography[index]:
+                    if is_local:
+                        path = song
+                    else:
+                        path = self.downloaded(song, download)
+                        if path is None:
                             continue
-                    speech = self.music_meta(song, artist, is_local)
+                    speech = self.music_meta(song, artist, is_local, path=path)
                     self.speak(speech, announce=True)
-                    speech = self.music_meta(song, artist, is_local, False)
+                    speech = self.music_meta(song, artist, is_local, False, path)
                     self.speak(speech, announce=True)
-                    self.postprocess_music(song, is_local)
+                    self.postprocess_music(path)
                     speech = self.sprinkle_gpt()
                     self.speak(speech)
             elif action == "podcast":
@@ -754,77 +2827,127 @@ class Dialogue:
             elif action == "end":
                 speech = self.over()
                 self.speak(speech, announce=True)
+            if self.encoder is not None or self.server is not None:
+                self.publish()
         logging.info(
             "Starting post-processing to create the final broadcast. "
             "This may take a while."
         )
-        self.radio()
+        if self.encoder is not None or self.server is not None:
+            self.close_broadcast()
+        else:
+            self.radio()
         self.cleanup()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.downloads is not None:
+            self.downloads.shutdown(cancel_futures=True)
+            self.downloads = None
+        logging.info(
+            f"TTS cache: {self.clip_cache.hits} hits, {self.clip_cache.misses} misses."
+        )
+        logging.info(
+            f"Music library: {self.library.hits} hits, {self.library.misses} misses, "
+            f"{self.library.bytes_saved / 1024 / 1024:.1f} MB not downloaded."
+        )
+        logging.info(
+            f"Metadata cache: {self.metadata_cache.hits} hits, "
+            f"{self.metadata_cache.misses} misses."
+        )
+        self.resamples = _RESAMPLES["count"] - resamples + self.worker_resamples
+        logging.info(f"Resampled {self.resamples} clips to {AUDIO['sample_rate']} Hz.")
         logging.info("Broadcast created.")
         return 0
 
     def radio(self):
         """
-        Merges all the audio segments into one wav file
+        Renders the broadcast into one mp3 file in a single pass
+        The segments are piped as PCM into one ffmpeg process, which encodes
+        them and writes the tags and cover art along the way
         """
-        infiles = [
-            AudioSegment.from_file(f"{self.audio_dir}/a{i}.wav")
-            for i in range(self.index)
-        ]
-        outfile = "radio.wav"
-        base = infiles.pop(0)
-        for infile in infiles:
-            base = base.append(infile)
-        base.export(outfile, format="wav")
+        self.open_broadcast()
+        self.publish()
+        self.close_broadcast()
 
-    def cleanup(self):
+    def open_broadcast(self, live=False):
         """
-        Converts the main wav file to mp3 (to compress audio)
-        And removes all the temporary files/dir created
-        """
-        src = "radio.wav"
-        dest = "radio.mp3"
-        # Check if dest exists and delete it
-        # as FFmpeg cannot edit existing files in-place
-        if Path(dest).is_file():
-            os.remove(dest)
-        convert = FFmpeg(
-            global_options=["-loglevel", "error"],
-            inputs={src: None},
-            outputs={dest: ["-acodec", "libmp3lame", "-b:a", "128k"]},
-        )
-        convert.run()
-        self.metadata(f"./{dest}")
+        Starts the encoder of the broadcast
+        When live, the broadcast is also streamed over HTTP as it is played
+        """
+        self.poster_path, tags = self.metadata()
+        if live:
+            address = (AUDIO["stream_host"], AUDIO["stream_port"])
+            self.server = BroadcastServer(
+                address, AUDIO["stream_ahead"], PATH["broadcast"]
+            )
+            self.server.start(self.poster_path, tags)
+            host, port = self.server.server_address[:2]
+            logging.info(f"Streaming the broadcast on http://{host}:{port}/")
+        else:
+            self.encoder = _Encoder(PATH["broadcast"], self.poster_path, tags)
+        self.published = 0
+
+    def publish(self):
+        """
+        Encodes the segments added since the last call, in schedule order
+        The first call records the time to first audio
+        """
+        stop = len(self.timeline)
+        if stop == self.published:
+            return
+        if self.server is not None:
+            # Blocks while the stream is too far ahead of playback
+            for segment in self.timeline.segments[self.published : stop]:
+                self.server.publish(segment)
+        else:
+            self.timeline.stream(self.encoder.write, start=self.published, stop=stop)
+            self.encoder.flush()
+        self.published = stop
+        if self.time_to_first_audio is None:
+            self.time_to_first_audio = time.perf_counter() - self.started
+            logging.info(f"Time to first audio: {self.time_to_first_audio:.1f}s.")
+
+    def close_broadcast(self):
+        """
+        Encodes the remaining segments and finishes the broadcast
+        """
+        try:
+            self.publish()
+        finally:
+            try:
+                if self.server is not None:
+                    self.server.finish()
+                else:
+                    self.encoder.close()
+            finally:
+                self.encoder, self.server = None, None
+                os.remove(self.poster_path)
 
-        os.remove(src)
-        for index in range(self.index):
-            os.remove(f"{self.audio_dir}/a{index}.wav")
+    def cleanup(self):
+        """
+        Removes all the temporary files/dir created
+        """
+        self.timeline.clear()
+        if os.path.isdir(f"{self.audio_dir}/songs"):
+            # The directories of the downloaded songs (and failed downloads)
+            shutil.rmtree(f"{self.audio_dir}/songs")
         os.rmdir(f"{self.audio_dir}")
 
-    def metadata(self, dest):
+    def metadata(self):
         """
-        Add metadata for the dest file
+        Metadata for the broadcast - its tags and a poster for the cover art
         """
         today = datetime.date.today().strftime("%d %b %y")
-        title = self.rec.title() + ": " + today
-        album = f"{TTS['station_name']}'s broadcast"
-        artist = TTS["station_name"]
-        audiofile = eyed3.load(dest)
-        # Add poster
+        tags = {
+            "title": self.rec.title() + ": " + today,
+            "album": f"{TTS['station_name']}'s broadcast",
+            "artist": TTS["station_name"],
+        }
         poster_path = f"{self.audio_dir}/poster.jpeg"
         poster = randimage.utils.get_random_image((512, 512))
         matplotlib.image.imsave(poster_path, poster)
-        with open(poster_path, "rb") as image_file:
-            audiofile.tag.images.set(
-                ImageFrame.FRONT_COVER, image_file.read(), "image/jpeg"
-            )
-        # Add metadata
-        audiofile.tag.title = title
-        audiofile.tag.album = album
-        audiofile.tag.artist = artist
-        audiofile.tag.save()
-        # Cleanup
-        os.remove(poster_path)
+        return poster_path, tags
 
     def cleaner(self, speech):
         """
@@ -859,64 +2982,86 @@ class Dialogue:
             return
         speeches = sent_tokenize(speech)
         say = str()
-        start_file_index = self.index
+        chunks = []
         for _speech in speeches:
             curr = say + _speech
             if len(curr) > 200:
-                self.save_speech(self.cleaner(say))
+                chunks.append(self.cleaner(say))
                 say = str()
             say += _speech + " "
-        self.save_speech(say)
-        if announce:
-            self.background_music()
+        chunks.append(say)
+        # If speech is not an announcement, it is slowed down a bit
+        # This generates clear and audible segments
+        length_scale = 1.0 if announce else 1 / TTS["speech_tempo"]
+        if self.pool is not None:
+            self.submit_speech(chunks, announce, length_scale)
         else:
-            self.slow_it_down(start_file_index)
+            if TTS["batch_size"] > 1 and not self.daemon_alive():
+                self.save_speech_batch(chunks, length_scale)
+            else:
+                for chunk in chunks:
+                    self.save_speech(chunk, length_scale)
+            if announce:
+                self.background_music()
         self.silence()
 
-    def slow_it_down(self, start_index):
+    def submit_speech(self, chunks, announce, length_scale=1.0):
         """
-        If speech is not an announcement, it is slowed down a bit
-        This generates clear and audible segments
+        Submits the chunks to the TTS worker pool
+        Every chunk takes its place in the timeline right away, so the
+        broadcast order is kept no matter when the workers finish
         """
-        for index in range(start_index, self.index):
-            src = f"{self.audio_dir}/a{index}.wav"
-            dest = f"{self.audio_dir}/out.wav"
-            slowit = FFmpeg(
-                global_options=["-y", "-hide_banner", "-loglevel", "error"],
-                inputs={src: None},
-                outputs={dest: ["-filter:a", "atempo=0.85"]},
-            )
-            slowit.run()
-            # FFmpeg cannot edit existing files in-place
-            os.remove(src)
-            os.rename(dest, src)
+        chunks = [chunk for chunk in chunks if chunk]
+        for position, chunk in enumerate(chunks):
+            logging.info(f"Queueing speech for => {chunk}")
+            # Background music goes under the last clip of an announcement
+            background = announce and position == len(chunks) - 1
+            future = self.pool.submit(_render_speech, chunk, length_scale, background)
+            future.add_done_callback(self.count_cache_result)
+            self.timeline.add(_Segment(future=future))
+
+    def count_cache_result(self, future):
+        """
+        Counts the clip cache hits and misses, and the sample rate conversions,
+        of the TTS worker pool
+        """
+        if future.exception() is not None:
+            return
+        hit, _, resamples = future.result()
+        self.worker_resamples += resamples
+        if hit:
+            self.clip_cache.hits += 1
+        else:
+            self.clip_cache.misses += 1
 
     def background_music(self):
         """
         Background music is added during announcements
         """
         logging.info("Adding background music in this announcement.")
-        background = AudioSegment.from_wav(PATH["backg_music"])
-        background -= 25 * (1 / TTS["backg_music_vol"])  # reduce the volume
-        speech = AudioSegment.from_wav(f"{self.audio_dir}/a{self.index - 1}.wav")
-        imposed = background.overlay(speech, position=4000)
-        imposed.export(f"{self.audio_dir}/a{self.index - 1}.wav", format="wav")
+        position = len(self.timeline) - 1
+        speech = self.timeline.load(position)
+        self.timeline.replace(position, _add_background_music(speech))
 
     def silence(self):
         """
         Important to create distinct pauses between segments
         """
-        no_audio = AudioSegment.silent(duration=2000)
-        no_audio.export(f"{self.audio_dir}/a{self.index}.wav", format="wav")
-        self.index += 1
+        self.timeline.add(_Segment(silence=2000))
 
-    def init_speech(self):
+    @staticmethod
+    def init_speech():
         """
         Initializes the synthesizer for tts
         """
+        from TTS.server.server import create_argparser
+        from TTS.utils.manage import ModelManager
+        from TTS.utils.synthesizer import Synthesizer
+        from TTS import __file__ as tts_path
+
         with _SuppressTTSLogs():
-            args = create_argparser().parse_args()
-            args.model_name = "tts_models/en/vctk/vits"
+            args = create_argparser().parse_args([])
+            args.model_name = TTS["model_name"]
             path = Path(tts_path).parent / "./.models.json"
             manager = ModelManager(path)
             model_path, config_path, model_item = manager.download_model(
@@ -940,7 +3085,7 @@ class Dialogue:
             )
         return synthesizer
 
-    def save_speech(self, text):
+    def save_speech(self, text, length_scale=1.0):
         """
         Synthesizes the text and saves it
         Speaker p267 was chosen after a thorough search through Coqui-ai's tts models
@@ -950,18 +3095,134 @@ class Dialogue:
         """
         if text.strip() != "":
             logging.info(f"Synthesizing speech for => {text}")
+        if text:
+            key = _speech_key(text, length_scale)
+            audio = self.clip_cache.load(key)
+            if audio is None:
+                audio = self.synthesize(text, length_scale)
+                self.clip_cache.store(key, audio)
+            self.timeline.add(_Segment(audio=audio))
+
+    def daemon_alive(self):
+        """
+        Checks (once) whether a synthesizer daemon is serving
+        """
+        if self.use_daemon is None:
+            try:
+                _daemon_request({"op": "health"}, timeout=1)
+                logging.info(f"Using the synthesizer daemon at {TTS['daemon_socket']}.")
+                self.use_daemon = True
+            except (OSError, ValueError):
+                self.use_daemon = False
+        return self.use_daemon
+
+    def synthesize(self, text, length_scale=1.0):
+        """
+        Synthesizes the text
+        Uses the synthesizer daemon if it is running, and the in-process
+        synthesizer otherwise
+        """
+        if self.daemon_alive():
+            try:
+                response = _daemon_request(
+                    {
+                        "op": "tts",
+                        "text": text,
+                        "speaker": TTS["speaker_name"],
+                        "length_scale": length_scale,
+                    }
+                )
+            except OSError:
+                logging.warning(
+                    "Synthesizer daemon is not responding. Synthesizing in-process."
+                )
+                self.use_daemon = False
+            except (RuntimeError, ValueError) as error:
+                # The daemon is still up, so only this clip is synthesized here
+                logging.warning(
+                    f"Synthesizer daemon failed ({error}). Synthesizing in-process."
+                )
+            else:
+                try:
+                    wav = base64.b64decode(response["wav"])
+                    return AudioSegment.from_wav(io.BytesIO(wav))
+                except Exception as error:  # a reply which is not a WAV
+                    logging.warning(
+                        f"Synthesizer daemon sent unreadable speech ({error!r}). "
+                        "Synthesizing in-process."
+                    )
         if not hasattr(self, "synthesizer"):
             with _SuppressTTSLogs():
                 self.synthesizer = self.init_speech()
-        if text:
+        return _synthesize(self.synthesizer, text, length_scale=length_scale)
+
+    def save_speech_batch(self, texts, length_scale=1.0):
+        """
+        Synthesizes the texts in batches of TTS["batch_size"]
+        Clips found in the cache are not synthesized again
+        """
+        misses = []
+        for text in texts:
+            if not text:
+                continue
+            logging.info(f"Synthesizing speech for => {text}")
+            key = _speech_key(text, length_scale)
+            audio = self.clip_cache.load(key)
+            if audio is None:
+                # Keep the clip's place until its batch is synthesized
+                misses.append((text, key, len(self.timeline)))
+                self.timeline.add(_Segment())
+            else:
+                self.timeline.add(_Segment(audio=audio))
+        if misses and not hasattr(self, "synthesizer"):
             with _SuppressTTSLogs():
-                wavs = self.synthesizer.tts(
-                    text, speaker_name=TTS["speaker_name"], style_wav=""
-                )
-            self.synthesizer.save_wav(wavs, f"{self.audio_dir}/a{self.index}.wav")
-            self.index += 1
+                self.synthesizer = self.init_speech()
+        for start in range(0, len(misses), TTS["batch_size"]):
+            batch = misses[start : start + TTS["batch_size"]]
+            texts = [text for text, _, _ in batch]
+            with _SuppressTTSLogs():
+                clips = _synthesize_batch(self.synthesizer, texts, length_scale)
+            for audio, (_, key, position) in zip(clips, batch):
+                self.clip_cache.store(key, audio)
+                self.timeline.replace(position, audio)
 
 
 if __name__ == "__main__":
-    dialogue = Dialogue()
-    dialogue.flow()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--serve-tts",
+        action="store_true",
+        help="run a synthesizer daemon which keeps the TTS model loaded",
+    )
+    parser.add_argument(
+        "--tts-health",
+        action="store_true",
+        help="print the health and latency of the synthesizer daemon",
+    )
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        help="encode each segment into radio.mp3 as soon as it is generated",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream the broadcast live over HTTP while it is being generated",
+    )
+    cli_args = parser.parse_args()
+    if cli_args.serve_tts:
+        sys.exit(serve_tts())
+    elif cli_args.tts_health:
+        try:
+            health = _daemon_request({"op": "health"}, timeout=1)
+        except OSError:
+            logging.error("TTS daemon is not running.")
+            sys.exit(1)
+        print(json.dumps(health, indent=4))
+    else:
+        if cli_args.progressive:
+            AUDIO["progressive"] = True
+        if cli_args.stream:
+            AUDIO["stream"] = True
+        dialogue = Dialogue()
+        dialogue.flow()
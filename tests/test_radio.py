@@ -1,21 +1,55 @@
+from concurrent.futures import Future, ProcessPoolExecutor
 import glob
 import unittest
 from unittest.mock import MagicMock
 from mock import patch
-from radio import Recommend, Dialogue
-
+import radio
+from radio import (
+    BroadcastServer,
+    Recommend,
+    Dialogue,
+    SynthesisServer,
+    _ClipCache,
+    _MusicLibrary,
+    _add_background_music,
+    _background_bed,
+    _Segment,
+    _change_tempo,
+    _conform,
+    _daemon_request,
+    _gain,
+    _overlay,
+    _synthesize,
+    _to_array,
+    _to_segment,
+)
+
+import base64
+import contextlib
+import http.server
+import io
 import json
+import multiprocessing
 import os
 import shutil
+import sys
 from pathlib import Path
+import threading
+import time
+import urllib.parse
+import urllib.request
 
+import numpy
 import pandas as pd
 from feedparser.util import FeedParserDict
 from billboard import ChartEntry
 from requests.models import Response
 from itunespy.track import Track
-from pydub.generators import WhiteNoise
+from pydub import AudioSegment
+from pydub.generators import Sine, WhiteNoise
 from PIL import Image
+import eyed3
+import yt_dlp
 
 
 class Test_Recommend(unittest.TestCase):
@@ -30,6 +64,15 @@ class Test_Recommend(unittest.TestCase):
         if os.path.exists(cls.local_song_path):
             shutil.rmtree(cls.local_song_path)
 
+    def setUp(self):
+        # Every test indexes local songs in an empty library
+        cache_dir = f"{self.local_song_path}/caches"
+        caches = {"local_library": f"{cache_dir}/local.sqlite3"}
+        patcher = patch.dict("radio.PATH", caches)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+
     @patch("random.random")
     def test_title_day(self, mock_random):
         mock_random.return_value = 0.01
@@ -69,20 +112,35 @@ class Test_Recommend(unittest.TestCase):
         self.assertNotEqual(news, None)
         self.assertEqual(len(news), 2)
 
-    @patch("pandas.read_csv")
-    def test_playlist_by_genre(self, mock_read_csv):
+    def test_playlist_by_genre(self):
         data = {
-            "tags": [["rock", "soft rock"], ["rock", "britpop"]],
-            "artist_name": ["Adele", "Oasis"],
-            "title": ["Hello", "Wonderwall"],
+            "tags": ["['rock', 'soft rock']", "['rock', 'britpop']", "['britpop']"],
+            "artist_name": ["Adele", "Oasis", "Blur"],
+            "title": ["Hello", "Wonderwall", "Song 2"],
         }
-        df = pd.DataFrame(data)
-        mock_read_csv.return_value = df
-
-        rec = Recommend()
-        songs = rec.playlist_by_genre("rock", 2)
-        self.assertNotEqual(songs, None)
-        self.assertEqual(len(songs), 2)
+        csv_path = f"{self.local_song_path}/genres.csv"
+        pd.DataFrame(data).to_csv(csv_path, compression="gzip", index=False)
+        paths = {"songdata": csv_path, "genre_index": f"{self.local_song_path}/index"}
+
+        with patch.dict("radio.PATH", paths):
+            rec = Recommend()
+        songs = rec.playlist_by_genre("rock", 3)
+        self.assertEqual(sorted(songs), [("Adele", "Hello"), ("Oasis", "Wonderwall")])
+        self.assertIn(rec.playlist_by_genre("Britpop", 1)[0][0], ("Oasis", "Blur"))
+        # Tags are matched exactly, not as substrings
+        self.assertEqual(rec.playlist_by_genre("soft", 2), [])
+        self.assertEqual(rec.playlist_by_genre("soft rock", 2), [("Adele", "Hello")])
+
+        # The index is built once and reused by other instances
+        with patch("pandas.read_csv") as mock_read_csv, patch.dict("radio.PATH", paths):
+            self.assertEqual(len(Recommend().playlist_by_genre("britpop", 2)), 2)
+            self.assertEqual(mock_read_csv.call_count, 0)
+
+        # It is rebuilt when the CSV changes
+        data["tags"][2] = "['rock']"
+        pd.DataFrame(data).to_csv(csv_path, compression="gzip", index=False)
+        os.utime(csv_path, ns=(0, 10**9))
+        self.assertEqual(len(rec.playlist_by_genre("rock", 3)), 3)
 
     @patch("radio.musicbrainzngs.search_recordings")
     def test_artist_discography(self, mock_search_recordings):
@@ -93,11 +151,15 @@ class Test_Recommend(unittest.TestCase):
                 {"title": "Song 3"},
             ]
         }
-        rec = Recommend()
-        songs = rec.artist_discography("Artist 1", 2)
-        self.assertEqual(mock_search_recordings.call_count, 8)
+        cache_path = f"{self.local_song_path}/discography.json"
+        with patch.dict("radio.PATH", {"discography_cache": cache_path}):
+            rec = Recommend()
+            songs = rec.artist_discography("Artist 1", 2)
+        # The first page had every recording there is
+        self.assertEqual(mock_search_recordings.call_count, 1)
         self.assertNotEqual(songs, None)
         self.assertEqual(len(songs), 2)
+        os.remove(cache_path)
 
     @patch("radio.billboard.ChartData")
     def test_billboard(self, mock_ChartData):
@@ -154,6 +216,52 @@ class Test_Recommend(unittest.TestCase):
         songs = rec.local_music("./test_songs_does_not_exist/", 2)
         self.assertEqual(songs, [])
 
+    def test_local_music_recursive(self):
+        index_path = f"{self.local_song_path}/local.sqlite3"
+        album_path = f"{self.local_song_path}/library"
+        songs = {
+            "a/one.mp3": ("Queen", "Jazz", "Mustapha", 183.0),
+            "a/b/two.flac": ("Queen", "Jazz", "Bicycle Race", 181.0),
+            "c/three.ogg": ("Björk", "Post", "Hyperballad", 321.0),
+        }
+        for name in songs:
+            os.makedirs(os.path.dirname(f"{album_path}/{name}"), exist_ok=True)
+            Path(f"{album_path}/{name}").touch()
+        Path(f"{album_path}/a/cover.jpg").touch()
+
+        def probe(path):
+            return songs[os.path.relpath(path, os.path.abspath(album_path))]
+
+        with patch.dict("radio.PATH", {"local_library": index_path}), patch(
+            "radio._LocalLibrary.probe", side_effect=probe
+        ) as mock_probe:
+            found = Recommend().local_music(album_path, 10)
+            self.assertEqual(
+                sorted(os.path.basename(song) for song in found),
+                ["one.mp3", "three.ogg", "two.flac"],
+            )
+            self.assertEqual(mock_probe.call_count, 3)
+
+            # Only the changed file is probed again, deleted ones leave the index
+            os.remove(f"{album_path}/c/three.ogg")
+            with open(f"{album_path}/a/one.mp3", "wb") as f:
+                f.write(b"changed")
+            rec = Recommend()
+            found = rec.local_music(album_path, 10, {"artist": "queen"})
+            self.assertEqual(len(found), 2)
+            self.assertEqual(mock_probe.call_count, 4)
+            self.assertEqual(rec.local_music(album_path, 10, {"artist": "Björk"}), [])
+            found = rec.local_music(album_path, 1, {"album": "Jazz"})
+            self.assertEqual(len(found), 1)
+            self.assertEqual(
+                rec.local_library.tags(f"{album_path}/a/b/two.flac"),
+                ("Queen", "Bicycle Race"),
+            )
+            self.assertEqual(mock_probe.call_count, 4)
+
+        shutil.rmtree(album_path)
+        os.remove(index_path)
+
     def test_music_intro_outro(self):
         rec = Recommend()
         intro, outro = rec.music_intro_outro()
@@ -278,12 +386,26 @@ class Test_Dialogue(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        # If radio.wav exists, delete it
-        os.remove("./radio.wav")
-
         if os.path.exists(cls.test_path):
             shutil.rmtree(cls.test_path)
 
+    def setUp(self):
+        # Every test looks speech, songs, metadata and feeds up with empty caches
+        cache_dir = f"{self.test_path}/caches"
+        caches = {
+            "local_library": f"{cache_dir}/local.sqlite3",
+            "tts_cache": f"{cache_dir}/tts",
+            "music_library": f"{cache_dir}/music",
+            "metadata_cache": f"{cache_dir}/metadata.json",
+            "discography_cache": f"{cache_dir}/discography.json",
+            "feed_cache": f"{cache_dir}/feeds",
+            "episode_cache": f"{cache_dir}/episodes",
+        }
+        patcher = patch.dict("radio.PATH", caches)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+
     def test_wakeup(self):
         dialogue = Dialogue(self.test_path)
         speech = dialogue.wakeup()
@@ -361,103 +483,271 @@ class Test_Dialogue(unittest.TestCase):
         self.assertEqual(isinstance(speech, str), True)
 
     @patch("radio.ytmdl.core.search")
-    @patch("yt_dlp.YoutubeDL.download")
-    def test_music(self, mock_download, mock_search):
-        # Generate an mp3 file and fill it with white noise
-        audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        audio_file.export(f"{self.test_path}/new.mp3", format="mp3")
+    @patch("yt_dlp.YoutubeDL.extract_info")
+    def test_music(self, mock_extract_info, mock_search):
+        # NOTE: Using a different path, so the song's directory is the only one
+        test_path = "./test_audio_music/"
+
+        def extract_info(url, download=True):
+            # Generate the native audio stream and fill it with white noise
+            song_dir = glob.glob(f"{test_path}/songs/*/")[0]
+            audio_file = WhiteNoise().to_audio_segment(duration=1000)
+            audio_file.export(f"{song_dir}/VIDEO_ID.webm", format="webm")
+            return {
+                "title": "Song Title (Official Video)",
+                "track": "Song Title",
+                "uploader": "Artist 1 - Topic",
+                "artist": "Artist 1",
+                "requested_downloads": [{"filepath": f"{song_dir}/VIDEO_ID.webm"}],
+            }
+
         mock_search.return_value = "YOUTUBE_URL", "Song Title"
-        mock_download.return_value = 0
+        mock_extract_info.side_effect = extract_info
 
-        dialogue = Dialogue(self.test_path)
-        dialogue.music("Song 1", artist="Artist 1")
+        with patch.dict("radio.PATH", {"music_library": f"{test_path}/library"}):
+            dialogue = Dialogue(test_path)
+        path = dialogue.music("Song 1", artist="Artist 1")
         self.assertEqual(mock_search.call_count, 1)
-        self.assertEqual(mock_download.call_count, 1)
-        self.assertTrue(not os.path.exists(f"{self.test_path}/new.mp3"))
-        self.assertTrue(os.path.exists(f"{self.test_path}/song.mp3"))
+        self.assertEqual(mock_extract_info.call_count, 1)
+        # The native stream is kept in the music library, without transcoding
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(path.endswith(".webm"))
+        self.assertEqual(os.path.dirname(path), f"{test_path}/library")
+        self.assertEqual(dialogue.library.misses, 1)
+        self.assertEqual(
+            dialogue.library.source(path),
+            {"artist": "Artist 1", "title": "Song Title"},
+        )
+
+        # The next time it is found without searching for it
+        self.assertEqual(dialogue.music("song 1!", artist="ARTIST 1"), path)
+        self.assertEqual(mock_search.call_count, 1)
+        self.assertEqual(mock_extract_info.call_count, 1)
+        self.assertEqual(dialogue.library.hits, 1)
+        self.assertEqual(dialogue.library.bytes_saved, os.path.getsize(path))
 
         # Delete test song
-        os.remove(f"{self.test_path}/song.mp3")
+        shutil.rmtree(test_path)
 
     @patch("radio.ytmdl.core.search")
-    @patch("yt_dlp.YoutubeDL.download")
-    def test_music_error(self, mock_download, mock_search):
+    @patch("yt_dlp.YoutubeDL.extract_info")
+    def test_music_error(self, mock_extract_info, mock_search):
         mock_search.return_value = "YOUTUBE_URL", "Song Title"
-        mock_download.return_value = 1
+        mock_extract_info.side_effect = yt_dlp.utils.DownloadError("Unavailable")
 
         dialogue = Dialogue(self.test_path)
-        dialogue.music("Song 1", artist="Artist 1")
+        path = dialogue.music("Song 1", artist="Artist 1")
         self.assertEqual(mock_search.call_count, 1)
-        self.assertEqual(mock_download.call_count, 1)
-        self.assertTrue(not os.path.exists(f"{self.test_path}/song.mp3"))
+        self.assertEqual(mock_extract_info.call_count, 1)
+        self.assertEqual(path, None)
 
-    def test_postprocess_music(self):
-        # Generate an mp3 file and fill it with white noise
-        audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        audio_file.export(f"{self.test_path}/song.mp3", format="mp3")
-        audio_file.export(f"{self.test_path}/a0.wav", format="wav")
+    @patch("radio.ytmdl.core.search")
+    @patch("yt_dlp.YoutubeDL.extract_info")
+    def test_music_program_arguments(self, mock_extract_info, mock_search):
+        mock_search.return_value = "YOUTUBE_URL", "Song Title"
+        mock_extract_info.side_effect = yt_dlp.utils.DownloadError("Unavailable")
 
         dialogue = Dialogue(self.test_path)
-        dialogue.index += 2
-        dialogue.postprocess_music("Song 1", is_local=False)
-        self.assertTrue(os.path.exists(f"{self.test_path}/a2.wav"))
-        self.assertTrue(not os.path.exists(f"{self.test_path}/song.mp3"))
+        # radio.py's own flags are not parsed as ytmdl's
+        for flag in ["--progressive", "--stream"]:
+            argv = ["radio.py", flag]
+            with patch("sys.argv", argv):
+                path = dialogue.music("-Song 1", artist="Artist 1")
+                self.assertEqual(sys.argv, argv)
+            self.assertEqual(path, None)
+            args = mock_search.call_args.args[1]
+            self.assertEqual(args.SONG_NAME, ["-Song 1"])
+            self.assertEqual(
+                (args.artist, args.choice, args.quiet), ("Artist 1", 1, True)
+            )
 
-        # Delete test songs
-        os.remove(f"{self.test_path}/a0.wav")
-        os.remove(f"{self.test_path}/a2.wav")
+    def test_music_library(self):
+        library_dir = f"{self.test_path}/library"
+        library = _MusicLibrary(library_dir, 10 * 1024 * 1024)
+        song_path = f"{self.test_path}/download.mp3"
+        with open(song_path, "wb") as file:
+            file.write(b"ID3" + bytes(1000))
+        path = library.store("https://youtu.be/1", "Artist 1", "Song 1", song_path)
+        self.assertTrue(not os.path.exists(song_path))
+        self.assertEqual(library.find("artist 1", "Song 1."), path)
+        self.assertEqual(library.find("Artist 2", "Song 1"), None)
+        # Found by url under another name, which becomes an alias
+        self.assertEqual(library.find("", "Song One", url="https://youtu.be/1"), path)
+        library.annotate(path, {"primaryGenreName": "Genre 1"})
+
+        # The library is shared across broadcasts
+        library = _MusicLibrary(library_dir, 10 * 1024 * 1024)
+        self.assertEqual(library.find(None, "song one"), path)
+        self.assertEqual(library.metadata(path), {"primaryGenreName": "Genre 1"})
+        self.assertEqual(library.metadata(song_path), None)
+        self.assertEqual((library.hits, library.bytes_saved), (1, 1003))
+
+        # Corrupt songs are removed and downloaded again
+        with open(path, "r+b") as file:
+            file.write(b"XYZ")
+        self.assertEqual(library.find("Artist 1", "Song 1"), None)
+        self.assertTrue(not os.path.exists(path))
+        shutil.rmtree(library_dir)
+
+    def test_music_library_eviction(self):
+        library_dir = f"{self.test_path}/library"
+        paths = []
+        for i in range(3):
+            song_path = f"{self.test_path}/download.mp3"
+            with open(song_path, "wb") as file:
+                file.write(bytes(1000))
+            # A new library for every broadcast, so only its own song is pinned
+            library = _MusicLibrary(library_dir, 2000)
+            paths.append(library.store(f"url {i}", None, f"Song {i}", song_path))
+            os.utime(paths[-1], (i, i))
+        # The least recently used song was evicted
+        self.assertTrue(not os.path.exists(paths[0]))
+        self.assertTrue(os.path.exists(paths[1]))
+        self.assertTrue(os.path.exists(paths[2]))
+        self.assertEqual(library.find(None, "Song 0"), None)
+
+        # Songs of the current broadcast are never evicted
+        library = _MusicLibrary(library_dir, 0)
+        self.assertEqual(library.find(None, "Song 1"), paths[1])
+        library.evict()
+        self.assertTrue(os.path.exists(paths[1]))
+        self.assertTrue(not os.path.exists(paths[2]))
+        shutil.rmtree(library_dir)
+
+    @patch("radio.Dialogue.music")
+    def test_prefetch(self, mock_music):
+        # Two downloads have to be running at once to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
 
-    def test_postprocess_music_local(self):
+        def music(song, artist):
+            barrier.wait()
+            if song == "Song 3":
+                raise OSError("Network is unreachable")
+            return None if song == "Song 2" else f"{song}.mp3"
+
+        mock_music.side_effect = music
+        dialogue = Dialogue(self.test_path)
+        songs = [(f"Artist {i}", f"Song {i}") for i in range(1, 5)]
+        with patch.dict("radio.AUDIO", {"download_workers": 2}):
+            downloads = dialogue.prefetch(songs)
+        paths = [
+            dialogue.downloaded(song, download)
+            for (_, song), download in zip(songs, downloads)
+        ]
+        # In schedule order, with the failures skipped
+        self.assertEqual(paths, ["Song 1.mp3", None, None, "Song 4.mp3"])
+        self.assertEqual(mock_music.call_count, 4)
+        dialogue.downloads.shutdown()
+
+    def test_postprocess_music(self):
         # Generate an mp3 file and fill it with white noise
         audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        song_path = f"{self.test_path}/song.mp3"
+        song_path = f"{self.test_path}/songs/library/0123456789.mp3"
+        os.makedirs(os.path.dirname(song_path), exist_ok=True)
         audio_file.export(song_path, format="mp3")
-        audio_file.export(f"{self.test_path}/a0.wav", format="wav")
 
         dialogue = Dialogue(self.test_path)
-        dialogue.index += 2
-        dialogue.postprocess_music(song_path, is_local=True)
-        self.assertTrue(os.path.exists(f"{self.test_path}/a2.wav"))
-        self.assertTrue(os.path.exists(f"{self.test_path}/song.mp3"))
+        # Outro and the silence after it
+        dialogue.timeline.add(_Segment(audio=audio_file))
+        dialogue.timeline.add(_Segment(silence=2000))
+        dialogue.postprocess_music(song_path)
+        self.assertEqual(len(dialogue.timeline), 3)
+        song = dialogue.timeline.segments[0]
+        self.assertEqual(song.path, song_path)
+
+        # Songs belong to the music library, they outlive the timeline
+        dialogue.timeline.clear()
+        self.assertTrue(os.path.exists(song_path))
 
         # Delete test songs
-        os.remove(f"{self.test_path}/a0.wav")
-        os.remove(f"{self.test_path}/a2.wav")
-        os.remove(song_path)
+        shutil.rmtree(f"{self.test_path}/songs")
 
     @patch("podcastparser.parse")
-    @patch("urllib.request.urlopen")
-    def test_podcast_dialogue_start(self, mock_urlopen, mock_parse):
+    @patch("radio.requests.get")
+    def test_podcast_dialogue_start(self, mock_get, mock_parse):
         mock_parse.return_value = {"title": "Title", "itunes_author": "Author"}
-        mock_urlopen.return_value = "URL"
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b""
+        mock_get.return_value.headers = {}
         dialogue = Dialogue(self.test_path)
         speech = dialogue.podcast_dialogue("RSS feed", start=True)
         self.assertEqual(mock_parse.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
 
     @patch("podcastparser.parse")
-    @patch("urllib.request.urlopen")
-    def test_podcast_dialogue_end(self, mock_urlopen, mock_parse):
+    @patch("radio.requests.get")
+    def test_podcast_dialogue_end(self, mock_get, mock_parse):
         mock_parse.return_value = {"title": "Title", "itunes_author": "Author"}
-        mock_urlopen.return_value = "URL"
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b""
+        mock_get.return_value.headers = {}
         dialogue = Dialogue(self.test_path)
         speech = dialogue.podcast_dialogue("RSS feed", start=False)
         self.assertEqual(mock_parse.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
 
+    def test_feed_cache(self):
+        feed = (
+            '<rss version="2.0" '
+            'xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"><channel>'
+            "<title>Title</title><itunes:author>Author</itunes:author>"
+            "<item><title>Episode</title><guid>1</guid>"
+            '<enclosure url="http://127.0.0.1/ep.mp3" type="audio/mpeg" length="1"/>'
+            "</item></channel></rss>"
+        ).encode("UTF-8")
+        requests_seen = []
+
+        # Serves the feed with an ETag, and a 304 when it is sent back
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                conditional = self.headers.get("If-None-Match") == '"v1"'
+                requests_seen.append(conditional)
+                self.send_response(304 if conditional else 200)
+                self.send_header("ETag", '"v1"')
+                if not conditional:
+                    self.send_header("Content-Length", str(len(feed)))
+                self.end_headers()
+                if not conditional:
+                    self.wfile.write(feed)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/feed.xml"
+
+        dialogue = Dialogue(self.test_path)
+        self.assertIn("Title from Author", dialogue.podcast_dialogue(url, start=True))
+        self.assertIn("Title from Author", dialogue.podcast_dialogue(url, start=False))
+        # Fetched and parsed once for the whole broadcast
+        self.assertEqual(requests_seen, [False])
+
+        # The next broadcast only revalidates it
+        with patch("podcastparser.parse") as mock_parse:
+            parsed = Dialogue(self.test_path).feeds.get(url)
+        self.assertEqual(mock_parse.call_count, 0)
+        self.assertEqual(requests_seen, [False, True])
+        self.assertEqual(parsed["episodes"][0]["title"], "Episode")
+
+        # And falls back to the cached copy when the feed is unreachable
+        server.shutdown()
+        server.server_close()
+        self.assertEqual(Dialogue(self.test_path).feeds.get(url), parsed)
+
     @patch("os.remove")
-    @patch("pydub.AudioSegment.export")
-    @patch("pydub.AudioSegment.from_mp3")
     @patch("subprocess.run")
+    @patch("radio._fetch_ranges")
     @patch("podcastparser.parse")
-    @patch("urllib.request.urlopen")
+    @patch("radio.requests.get")
     def test_podcast_clip(
         self,
-        mock_urlopen,
+        mock_get,
         mock_parse,
+        mock_fetch_ranges,
         mock_run,
-        mock_from_mp3,
-        mock_export,
         mock_remove,
     ):
         dialogue = Dialogue(self.test_path)
@@ -467,18 +757,170 @@ class Test_Dialogue(unittest.TestCase):
             "itunes_author": "Author",
             "episodes": [{"enclosures": [{"url": "URL"}]}],
         }
-        mock_urlopen.return_value = "URL"
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b""
+        mock_get.return_value.headers = {}
+        mock_fetch_ranges.return_value = iter([b"Not audio"])
 
-        # Generate an mp3 file and fill it with white noise
-        audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        mock_from_mp3.return_value = audio_file
+        # The clip as ffmpeg decodes it, in the broadcast's format
+        samples = _conform(WhiteNoise().to_audio_segment(duration=1000))
+        mock_run.return_value.stdout = _to_segment(samples, 44100).raw_data
 
         dialogue.podcast_clip("RSS feed", duration=100)
         self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(mock_fetch_ranges.call_count, 1)
+        # Without pauses, the first 100 minutes are decoded
         self.assertEqual(mock_run.call_count, 1)
-        self.assertEqual(mock_from_mp3.call_count, 1)
-        self.assertEqual(mock_export.call_count, 2)
+        command = mock_run.call_args.args[0]
+        self.assertEqual(command[command.index("-ss") + 1], "0.000")
+        self.assertEqual(command[command.index("-t") + 1], "6000.000")
+        self.assertEqual(len(dialogue.timeline.segments[0].audio), 1000)
+        # The clip is kept in memory and the silence after it is virtual
         self.assertEqual(mock_remove.call_count, 1)
+        self.assertEqual(len(dialogue.timeline), 2)
+        # A copy is kept with the episode's analysis
+        self.assertEqual(len(glob.glob(f"{radio.PATH['episode_cache']}/*.wav")), 1)
+        self.assertEqual(len(glob.glob(f"{radio.PATH['episode_cache']}/*.json")), 1)
+
+    @patch("podcastparser.parse")
+    @patch("radio.requests.get")
+    def test_podcast_clip_ranges(self, mock_get, mock_parse):
+        # Talk of 3, 20 and 20 seconds with 2 second pauses, then a long tail
+        episode = AudioSegment.empty()
+        for seconds in (3, 20, 20):
+            episode += Sine(440).to_audio_segment(duration=seconds * 1000)
+            episode += AudioSegment.silent(duration=2000, frame_rate=44100)
+        episode += Sine(440).to_audio_segment(duration=120 * 1000)
+        os.makedirs(self.test_path, exist_ok=True)
+        episode.export(f"{self.test_path}/episode.mp3", format="mp3")
+        with open(f"{self.test_path}/episode.mp3", "rb") as f:
+            data = f.read()
+        served = []
+
+        # Serves the episode in byte ranges
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/ep.mp3":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                start, end = self.headers["Range"].split("=")[1].split("-")
+                start = int(start)
+                end = min(int(end), len(data) - 1) if end else len(data) - 1
+                if start >= len(data):
+                    self.send_response(416)
+                    self.end_headers()
+                    return
+                served.append(end - start + 1)
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                with contextlib.suppress(ConnectionError):
+                    self.wfile.write(data[start : end + 1])
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        mock_parse.return_value = {
+            "title": "Title",
+            "itunes_author": "Author",
+            "episodes": [
+                {
+                    "title": "Old",
+                    "enclosures": [
+                        {"url": f"http://127.0.0.1:{server.server_port}/ep.mp3"}
+                    ],
+                }
+            ],
+        }
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b""
+        mock_get.return_value.headers = {}
+
+        dialogue = Dialogue(self.test_path)
+        with patch.dict("radio.AUDIO", {"podcast_range_kb": 16}):
+            dialogue.podcast_clip("RSS feed", duration=0.5)
+        # From the middle of the first pause to the middle of the second
+        clip = dialogue.timeline.segments[0].audio
+        self.assertAlmostEqual(len(clip), 22000, delta=200)
+        # The download stopped once the clip was found
+        self.assertGreater(len(served), 1)
+        self.assertLess(sum(served), len(data) / 2)
+        self.assertFalse(os.path.exists(f"{self.test_path}/podcast.mp3"))
+
+        # The next broadcast uses the cached clip without downloading anything
+        requests_made = len(served)
+        dialogue = Dialogue(self.test_path)
+        dialogue.podcast_clip("RSS feed", duration=0.5)
+        self.assertEqual(dialogue.timeline.segments[0].audio, clip)
+        self.assertEqual(len(served), requests_made)
+
+        # Another length is cut at the pauses found before, without scanning again
+        dialogue = Dialogue(self.test_path)
+        with patch("radio.Dialogue.scan_podcast") as mock_scan_podcast:
+            dialogue.podcast_clip("RSS feed", duration=0.4)
+        self.assertEqual(mock_scan_podcast.call_count, 0)
+        self.assertAlmostEqual(
+            len(dialogue.timeline.segments[0].audio), 22000, delta=200
+        )
+        requests_made = len(served)
+
+        # A new episode which can not be downloaded falls back to the old one
+        episode = mock_parse.return_value["episodes"][0]
+        new_episode = {
+            "title": "New",
+            "enclosures": [{"url": episode["enclosures"][0]["url"] + "?new"}],
+        }
+        mock_parse.return_value["episodes"] = [new_episode, episode]
+        dialogue = Dialogue(self.test_path)
+        dialogue.podcast_clip("RSS feed", duration=0.5)
+        self.assertEqual(dialogue.timeline.segments[0].audio, clip)
+        self.assertEqual(len(served), requests_made)
+
+    def test_episode_cache_eviction(self):
+        cache_dir = f"{self.test_path}/episodes"
+        episodes = radio._EpisodeCache(cache_dir, 10 * 1024)
+        clip = AudioSegment.silent(duration=100, frame_rate=22050)  # ~4.4 KB
+        for episode in ["a", "b", "c", "d"]:
+            episodes.store(f"{episode}-clip", clip)
+            episodes.analyzed(episode, {"pauses": [[0, 1]], "clips": {}})
+            time.sleep(0.01)
+        # Analyses are evicted along with the clips, least recently used first
+        self.assertEqual(episodes.analysis("a"), None)
+        self.assertEqual(episodes.analysis("d")["pauses"], [[0, 1]])
+        self.assertEqual(episodes.load("d-clip"), clip)
+        size = sum(entry.stat().st_size for entry in os.scandir(cache_dir))
+        self.assertLessEqual(size, 10 * 1024)
+        shutil.rmtree(cache_dir)
+
+    def test_silence_detector(self):
+        # Noise with pauses at known samples, one of them too short
+        noise = WhiteNoise(sample_rate=22050).to_audio_segment(duration=1000)
+        samples = numpy.tile(numpy.frombuffer(noise.raw_data, dtype=numpy.int16), 4)
+        samples = samples.copy()
+        samples[abs(samples) <= 6553] = 7000
+        for start, end in [(1000, 30000), (40000, 41000), (60001, 88200)]:
+            samples[start:end] = numpy.random.randint(-6553, 6554, end - start)
+        raw = samples.tobytes()
+
+        detector = radio._SilenceDetector(min_samples=24255, threshold=6553)
+        # Blocks of any size, even odd ones, find the same pauses
+        pauses = []
+        for offset in range(0, len(raw), 4097):
+            pauses += detector.feed(raw[offset : offset + 4097])
+        pauses += detector.close()
+        self.assertEqual(pauses, [(1000, 30000), (60001, 88200)])
+        # Plain ints, which can be kept in JSON
+        self.assertTrue(
+            all(type(sample) is int for pause in pauses for sample in pause)
+        )
+        self.assertEqual(radio._longest_clip(pauses, 22050 * 60), (15500, 74100))
+        self.assertEqual(radio._longest_clip(pauses, 22050), (0, 15500))
 
     @patch("radio.Recommend.music_intro_outro")
     @patch("itunespy.search_track")
@@ -502,7 +944,13 @@ class Test_Dialogue(unittest.TestCase):
         ]
         mock_music_intro_outro.return_value = ("Intro speech", "Outro speech")
         dialogue = Dialogue(self.test_path)
-        speech = dialogue.music_meta("Song 1", artist=None, is_local=False, start=True)
+        speech = dialogue.music_meta(
+            "Song 1",
+            artist=None,
+            is_local=False,
+            start=True,
+            path=f"{self.test_path}/song.mp3",
+        )
         self.assertEqual(mock_search_track.call_count, 1)
         self.assertEqual(mock_music_intro_outro.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
@@ -533,7 +981,13 @@ class Test_Dialogue(unittest.TestCase):
         ]
         mock_music_intro_outro.return_value = ("Intro speech", "Outro speech")
         dialogue = Dialogue(self.test_path)
-        speech = dialogue.music_meta("Song 1", artist=None, is_local=False, start=False)
+        speech = dialogue.music_meta(
+            "Song 1",
+            artist=None,
+            is_local=False,
+            start=False,
+            path=f"{self.test_path}/song.mp3",
+        )
         self.assertEqual(mock_search_track.call_count, 1)
         self.assertEqual(mock_music_intro_outro.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
@@ -542,6 +996,47 @@ class Test_Dialogue(unittest.TestCase):
         # Delete test song
         os.remove(f"{self.test_path}/song.mp3")
 
+    @patch("itunespy.search_track")
+    def test_itunes_metadata_cache(self, mock_search_track):
+        mock_search_track.return_value = [
+            Track(
+                json={
+                    "artistName": name,
+                    "trackName": "Song 1",
+                    "primaryGenreName": genre,
+                }
+            )
+            for name, genre in [
+                ("The Artist Ones", "Genre 1"),
+                ("Artist 2", "Genre 2"),
+                ("Artist 2", "Genre 3"),
+                ("Artist 1", "Genre 4"),
+                ("Artist 1", "Genre 5"),
+            ]
+        ]
+        dialogue = Dialogue(self.test_path)
+        metadata = dialogue.itunes_metadata("Song 1", "Artist 1")
+        self.assertEqual(metadata["primaryGenreName"], "Genre 4")
+        # The end of the song and later broadcasts do not search again
+        self.assertEqual(dialogue.itunes_metadata("Song 1", "Artist 1"), metadata)
+        dialogue = Dialogue(self.test_path)
+        self.assertEqual(dialogue.itunes_metadata("song 1!", "ARTIST 1"), metadata)
+        self.assertEqual(mock_search_track.call_count, 1)
+        self.assertEqual(dialogue.metadata_cache.hits, 1)
+
+    @patch("time.sleep")
+    @patch("time.monotonic")
+    def test_token_bucket(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 100.0
+        bucket = radio._TokenBucket(rate=0.5, capacity=2)
+        # The burst goes through, then requests wait 2s apart
+        for _ in range(4):
+            bucket.acquire()
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [2.0, 4.0])
+        mock_monotonic.return_value = 110.0
+        bucket.acquire()
+        self.assertEqual(mock_sleep.call_count, 2)
+
     @patch("itunespy.search_track")
     @patch("time.sleep")
     def test_music_meta_exception(self, mock_sleep, mock_search_track):
@@ -568,7 +1063,13 @@ class Test_Dialogue(unittest.TestCase):
         mock_sleep.return_value = None
 
         dialogue = Dialogue(self.test_path)
-        speech = dialogue.music_meta("Song 1", artist=None, is_local=False, start=False)
+        speech = dialogue.music_meta(
+            "Song 1",
+            artist=None,
+            is_local=False,
+            start=False,
+            path=f"{self.test_path}/song.mp3",
+        )
         self.assertEqual(mock_search_track.call_count, 2)
         self.assertEqual(mock_sleep.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
@@ -578,52 +1079,43 @@ class Test_Dialogue(unittest.TestCase):
         os.remove(f"{self.test_path}/song.mp3")
 
     @patch("radio.Recommend.music_intro_outro")
-    @patch("eyed3.load")
-    def test_music_meta_local_start(self, mock_load, mock_music_intro_outro):
-        metadata_mock = MagicMock()
-        metadata_mock.tag.title = "Example Song"
-        metadata_mock.tag.artist = "Example Artist"
-        mock_load.return_value = metadata_mock
+    @patch("radio._LocalLibrary.tags")
+    def test_music_meta_local_start(self, mock_tags, mock_music_intro_outro):
+        mock_tags.return_value = ("Example Artist", "Example Song")
         mock_music_intro_outro.return_value = ("Intro speech", "Outro speech")
 
         dialogue = Dialogue(self.test_path)
         speech = dialogue.music_meta("Song 1", artist=None, is_local=True, start=True)
         self.assertEqual(mock_music_intro_outro.call_count, 1)
-        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(mock_tags.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
         self.assertIn("Example Song", speech)
         self.assertIn("Example Artist", speech)
 
     @patch("radio.Recommend.music_intro_outro")
-    @patch("eyed3.load")
-    def test_music_meta_local_no_start(self, mock_load, mock_music_intro_outro):
-        metadata_mock = MagicMock()
-        metadata_mock.tag.title = "Example Song"
-        metadata_mock.tag.artist = "Example Artist"
-        mock_load.return_value = metadata_mock
+    @patch("radio._LocalLibrary.tags")
+    def test_music_meta_local_no_start(self, mock_tags, mock_music_intro_outro):
+        mock_tags.return_value = ("Example Artist", "Example Song")
         mock_music_intro_outro.return_value = ("Intro speech", "Outro speech")
 
         dialogue = Dialogue(self.test_path)
         speech = dialogue.music_meta("Song 1", artist=None, is_local=True, start=False)
         self.assertEqual(mock_music_intro_outro.call_count, 1)
-        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(mock_tags.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
         self.assertIn("Example Song", speech)
         self.assertIn("Example Artist", speech)
 
     @patch("radio.Recommend.music_intro_outro")
-    @patch("eyed3.load")
-    def test_music_meta_local_no_metadata(self, mock_load, mock_music_intro_outro):
-        metadata_mock = MagicMock()
-        metadata_mock.tag.title = "Example Song"
-        metadata_mock.tag.artist = None
-        mock_load.return_value = metadata_mock
+    @patch("radio._LocalLibrary.tags")
+    def test_music_meta_local_no_metadata(self, mock_tags, mock_music_intro_outro):
+        mock_tags.return_value = (None, "Example Song")
         mock_music_intro_outro.return_value = ("Intro speech", "Outro speech")
 
         dialogue = Dialogue(self.test_path)
         speech = dialogue.music_meta("Song 1", artist=None, is_local=True, start=True)
         self.assertEqual(mock_music_intro_outro.call_count, 1)
-        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(mock_tags.call_count, 1)
         self.assertEqual(isinstance(speech, str), True)
         self.assertNotIn("Example Song", speech)
 
@@ -638,6 +1130,61 @@ class Test_Dialogue(unittest.TestCase):
         self.assertEqual(mock_artist_discography.call_count, 2)
         self.assertEqual(len(songs), 2)
 
+    def test_curate_discography_artist_musicbrainz(self):
+        searches = []
+
+        # Stands in for the MusicBrainz search API, 150 recordings per artist
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                searches.append(query)
+                artist = query["query"][0].split(":")[-1].strip("()")
+                offset = int(query.get("offset", ["0"])[0])
+                limit = int(query["limit"][0])
+                recordings = "".join(
+                    f'<recording id="{i}"><title>{artist} {i}</title></recording>'
+                    for i in range(offset, min(offset + limit, 150))
+                )
+                body = (
+                    '<?xml version="1.0" encoding="UTF-8"?>'
+                    '<metadata xmlns="http://musicbrainz.org/ns/mmd-2.0#">'
+                    f'<recording-list count="150" offset="{offset}">{recordings}'
+                    "</recording-list></metadata>"
+                ).encode("UTF-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        radio.musicbrainzngs.set_hostname(f"127.0.0.1:{server.server_port}")
+        self.addCleanup(radio.musicbrainzngs.set_hostname, "musicbrainz.org", True)
+
+        meta = [("Artist 1", 2), ("Artist 2", 3), ("Artist 3", 1)]
+        with patch.dict("radio.AUDIO", {"musicbrainz_burst": 3}):
+            songs = Dialogue(self.test_path).curate_discography("music-artist", meta)
+            self.assertEqual(len(songs), 6)
+            self.assertTrue(
+                all(song.startswith(artist.lower()) for artist, song in songs)
+            )
+            # One page was enough for every artist
+            self.assertEqual(len(searches), 3)
+
+            # A warm cache is only extended when more songs are asked for
+            dialogue = Dialogue(self.test_path)
+            songs = dialogue.curate_discography("music-artist", meta)
+            self.assertEqual(len(searches), 3)
+            self.assertEqual(len(dialogue.rec.artist_discography("Artist 1", 30)), 30)
+            self.assertEqual(len(searches), 4)
+            self.assertEqual(searches[-1]["offset"], ["100"])
+
     @patch("radio.Recommend.playlist_by_genre")
     def test_curate_discography_genre(self, mock_playlist_by_genre):
         mock_playlist_by_genre.return_value = [
@@ -718,7 +1265,9 @@ class Test_Dialogue(unittest.TestCase):
         mock_speak,
         mock_wakeup,
     ):
-        mock_music.side_effect = [0, 1]
+        mock_music.side_effect = lambda song, artist: (
+            f"{self.test_path}/song.mp3" if song == "Song 1" else None
+        )
         mock_curate_discography.return_value = [
             ["Artist 1", "Song 1"],
             ["Artist 2", "Song 2"],
@@ -755,19 +1304,123 @@ class Test_Dialogue(unittest.TestCase):
         self.assertEqual(mock_sprinkle_gpt.call_count, 2)
         self.assertEqual(mock_wakeup.call_count, 1)
 
-    def test_radio(self):
-        # Generate two mp3 files and fill it with white noise
+    @patch("radio.Dialogue.metadata")
+    def test_radio(self, mock_metadata):
+        dialogue = Dialogue(self.test_path)
+        # Generate two audio clips and fill them with white noise
         audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        audio_file.export(f"{self.test_path}/a0.wav", format="wav")
         audio_file.export(f"{self.test_path}/a1.wav", format="wav")
+        image = Image.new("RGB", (1, 1), color="red")
+        image.save(f"{self.test_path}/poster.jpeg", format="jpeg")
+        mock_metadata.return_value = (
+            f"{self.test_path}/poster.jpeg",
+            {"title": "Test", "album": "Test's broadcast", "artist": "Test"},
+        )
+        broadcast_path = f"{self.test_path}/radio.mp3"
 
-        dialogue = Dialogue(self.test_path)
-        dialogue.index = 2
-        self.assertTrue(not os.path.exists("./radio.wav"))
-        dialogue.radio()
-        self.assertTrue(os.path.exists(f"{self.test_path}/a0.wav"))
+        dialogue.timeline.add(_Segment(audio=audio_file))
+        dialogue.timeline.add(_Segment(silence=500))
+        dialogue.timeline.add(_Segment(path=f"{self.test_path}/a1.wav"))
+        with patch.dict("radio.PATH", {"broadcast": broadcast_path}):
+            dialogue.radio()
         self.assertTrue(os.path.exists(f"{self.test_path}/a1.wav"))
-        self.assertTrue(os.path.exists("./radio.wav"))
+        self.assertTrue(os.path.exists(broadcast_path))
+        # The poster is only needed while encoding
+        self.assertTrue(not os.path.exists(f"{self.test_path}/poster.jpeg"))
+        broadcast = AudioSegment.from_mp3(broadcast_path)
+        self.assertAlmostEqual(len(broadcast), 2500, delta=100)
+        self.assertEqual(broadcast.frame_rate, 44100)
+        self.assertEqual(broadcast.channels, 2)
+        # The tags and cover art are written in the same pass
+        audiofile = eyed3.load(broadcast_path)
+        self.assertEqual(audiofile.tag.title, "Test")
+        self.assertEqual(audiofile.tag.artist, "Test")
+        self.assertEqual(len(audiofile.tag.images), 1)
+        os.remove(f"{self.test_path}/a1.wav")
+        os.remove(broadcast_path)
+
+    @patch("radio.Dialogue.metadata")
+    def test_publish(self, mock_metadata):
+        dialogue = Dialogue(self.test_path)
+        image = Image.new("RGB", (1, 1), color="red")
+        image.save(f"{self.test_path}/poster.jpeg", format="jpeg")
+        mock_metadata.return_value = (f"{self.test_path}/poster.jpeg", {})
+        broadcast_path = f"{self.test_path}/radio.mp3"
+        audio_file = WhiteNoise().to_audio_segment(duration=1000)
+
+        with patch.dict("radio.PATH", {"broadcast": broadcast_path}):
+            dialogue.open_broadcast()
+            dialogue.publish()
+            # Nothing to encode yet
+            self.assertEqual(dialogue.time_to_first_audio, None)
+            dialogue.timeline.add(_Segment(audio=audio_file))
+            dialogue.timeline.add(_Segment(silence=500))
+            dialogue.publish()
+            self.assertEqual(dialogue.published, 2)
+            self.assertNotEqual(dialogue.time_to_first_audio, None)
+            dialogue.timeline.add(_Segment(audio=audio_file))
+            dialogue.close_broadcast()
+        self.assertEqual(dialogue.published, 3)
+        self.assertEqual(dialogue.encoder, None)
+        broadcast = AudioSegment.from_mp3(broadcast_path)
+        self.assertAlmostEqual(len(broadcast), 2500, delta=100)
+        os.remove(broadcast_path)
+
+    def test_broadcast_server(self):
+        os.makedirs(self.test_path, exist_ok=True)
+        image = Image.new("RGB", (1, 1), color="red")
+        image.save(f"{self.test_path}/poster.jpeg", format="jpeg")
+        archive_path = f"{self.test_path}/radio.mp3"
+        audio_file = WhiteNoise().to_audio_segment(duration=1000)
+
+        server = BroadcastServer(("127.0.0.1", 0), 1, archive_path)
+        self.assertEqual(server.segments.maxsize, 1)
+        server.start(f"{self.test_path}/poster.jpeg", {"title": "Test"})
+        port = server.server_address[1]
+        # Two listeners share the one encoder
+        streams = [
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=10)
+            for _ in range(2)
+        ]
+        while len(server.listeners) < 2:
+            time.sleep(0.01)
+        for stream in streams:
+            self.assertEqual(stream.headers["Content-Type"], "audio/mpeg")
+        server.publish(_Segment(audio=audio_file))
+        server.publish(_Segment(silence=500))
+        server.finish()
+        received = [stream.read() for stream in streams]
+        with open(archive_path, "rb") as archive:
+            archived = archive.read()
+        self.assertEqual(received[0], archived)
+        self.assertEqual(received[1], archived)
+        broadcast = AudioSegment.from_mp3(archive_path)
+        self.assertAlmostEqual(len(broadcast), 1500, delta=100)
+        os.remove(archive_path)
+        os.remove(f"{self.test_path}/poster.jpeg")
+
+    def test_broadcast_server_error(self):
+        os.makedirs(self.test_path, exist_ok=True)
+        image = Image.new("RGB", (1, 1), color="red")
+        image.save(f"{self.test_path}/poster.jpeg", format="jpeg")
+        archive_path = f"{self.test_path}/radio.mp3"
+        failing = _Segment(path=f"{self.test_path}/undecodable.mp3")
+        failing.load = MagicMock(side_effect=RuntimeError("Undecodable"))
+
+        server = BroadcastServer(("127.0.0.1", 0), 1, archive_path)
+        server.poll_interval = 0.05
+        server.start(f"{self.test_path}/poster.jpeg", {"title": "Test"})
+        server.publish(failing)
+        # Publishing fails once the segment could not be written, instead of
+        # waiting forever for the queue to drain
+        with self.assertRaises(RuntimeError):
+            for _ in range(3):
+                server.publish(_Segment(silence=500))
+        with self.assertRaises(RuntimeError):
+            server.finish()
+        self.assertEqual(failing.load.call_count, 1)
+        os.remove(archive_path)
+        os.remove(f"{self.test_path}/poster.jpeg")
 
     @patch("radio.Dialogue.save_speech")
     @patch("radio.Dialogue.cleaner")
@@ -788,29 +1441,29 @@ class Test_Dialogue(unittest.TestCase):
 
     @patch("radio.Dialogue.save_speech")
     @patch("radio.Dialogue.cleaner")
-    @patch("radio.Dialogue.slow_it_down")
+    @patch("radio.Dialogue.background_music")
     @patch("radio.Dialogue.silence")
     def test_speak(
         self,
         mock_silence,
-        mock_slow_it_down,
+        mock_background_music,
         mock_cleaner,
         mock_save_speech,
     ):
         dialogue = Dialogue(self.test_path)
         dialogue.speak("Speech", announce=False)
         self.assertEqual(mock_silence.call_count, 1)
-        self.assertEqual(mock_slow_it_down.call_count, 1)
+        self.assertEqual(mock_background_music.call_count, 0)
         self.assertEqual(mock_save_speech.call_count, 1)
+        # Speech is slowed down by the model itself
+        self.assertAlmostEqual(mock_save_speech.call_args.args[1], 1 / 0.85)
 
     @patch("radio.Dialogue.save_speech")
     @patch("radio.Dialogue.cleaner")
-    @patch("radio.Dialogue.slow_it_down")
     @patch("radio.Dialogue.silence")
     def test_speak_long(
         self,
         mock_silence,
-        mock_slow_it_down,
         mock_cleaner,
         mock_save_speech,
     ):
@@ -825,62 +1478,239 @@ class Test_Dialogue(unittest.TestCase):
         dialogue.speak(speech, announce=False)
         self.assertEqual(mock_silence.call_count, 1)
         self.assertEqual(mock_cleaner.call_count, 1)
-        self.assertEqual(mock_slow_it_down.call_count, 1)
         # The first time, as length is greater than 300, it will
         # try and output what's before, which is nothing, and then
         # output this long sentence
         self.assertEqual(mock_save_speech.call_count, 2)
 
+    @patch("radio.Dialogue.cleaner")
+    @patch("radio.Dialogue.background_music")
+    @patch("radio.Dialogue.silence")
+    def test_speak_pool(
+        self,
+        mock_silence,
+        mock_background_music,
+        mock_cleaner,
+    ):
+        mock_cleaner.side_effect = lambda speech: speech
+        speech = (
+            "The birch canoe slid on the smooth planks, "
+            "Glue the sheet to the dark blue background, "
+            "It's easy to tell the depth of a well. "
+            "These days a chicken leg is a rare dish, "
+            "Rice is often served in round bowls, "
+            "The juice of lemons makes fine punch. "
+        )
+        dialogue = Dialogue(self.test_path)
+        dialogue.pool = MagicMock()
+        dialogue.speak(speech, announce=True)
+        self.assertEqual(dialogue.pool.submit.call_count, 2)
+        backgrounds = [call.args[3] for call in dialogue.pool.submit.call_args_list]
+        self.assertEqual(backgrounds, [False, True])
+        # Both clips take their place in the timeline before they are synthesized
+        self.assertEqual(len(dialogue.timeline), 2)
+        self.assertEqual(mock_background_music.call_count, 0)
+        self.assertEqual(mock_silence.call_count, 1)
+
+    def test_count_cache_result(self):
+        dialogue = Dialogue(self.test_path)
+        for hit in [True, False, False]:
+            future = Future()
+            future.set_result((hit, AudioSegment.silent(duration=10), 1))
+            dialogue.count_cache_result(future)
+        failed = Future()
+        failed.set_exception(RuntimeError("Synthesis failed"))
+        dialogue.count_cache_result(failed)
+        self.assertEqual(dialogue.clip_cache.hits, 1)
+        self.assertEqual(dialogue.clip_cache.misses, 2)
+        self.assertEqual(dialogue.worker_resamples, 3)
+
+    def test_speak_pool_resamples(self):
+        dialogue = Dialogue(self.test_path)
+        synthesizer = MagicMock()
+        synthesizer.output_sample_rate = 22050
+        synthesizer.tts.return_value = [0.0] * 22050
+        # Forked workers get the synthesizer, but count resamples on their own
+        radio._WORKER["synthesizer"] = synthesizer
+        radio._WORKER["cache"] = _ClipCache(f"{self.test_path}/worker", 1024 * 1024)
+        resamples = radio._RESAMPLES["count"]
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            dialogue.pool = pool
+            dialogue.submit_speech(["Speech"], announce=True)
+            speech = dialogue.timeline.load(0)
+        dialogue.pool = None
+        radio._WORKER.clear()
+        self.assertEqual(speech.frame_rate, 44100)
+        # The speech was conformed in the worker, and counted by the broadcast
+        self.assertEqual(radio._RESAMPLES["count"], resamples)
+        self.assertEqual(dialogue.worker_resamples, 1)
+        dialogue.timeline.clear()
+
+    def test_timeline_spill(self):
+        dialogue = Dialogue(self.test_path)
+        # Already in the broadcast's format, so it is kept as is
+        audio_file = WhiteNoise().to_audio_segment(duration=1000).set_channels(2)
+        dialogue.timeline.memory_budget = 1.5 * len(audio_file.raw_data)
+        dialogue.timeline.add(_Segment(audio=audio_file))
+        dialogue.timeline.add(_Segment(silence=2000))
+        self.assertEqual(dialogue.timeline.segments[0].audio, audio_file)
+        dialogue.timeline.add(_Segment(audio=audio_file))
+        # The oldest clip is spilled to disk once the budget is exceeded
+        spilled = dialogue.timeline.segments[0]
+        self.assertEqual(spilled.audio, None)
+        self.assertTrue(os.path.exists(spilled.path))
+        self.assertEqual(dialogue.timeline.segments[2].audio, audio_file)
+        self.assertEqual(dialogue.timeline.memory_used, len(audio_file.raw_data))
+        self.assertEqual(len(dialogue.timeline.load(0)), 1000)
+        self.assertEqual(len(dialogue.timeline.load(1)), 2000)
+        dialogue.timeline.clear()
+        self.assertTrue(not os.path.exists(spilled.path))
+
+    def test_timeline_canonical(self):
+        dialogue = Dialogue(self.test_path)
+        speech = Sine(440, sample_rate=22050).to_audio_segment(duration=1000)
+        resamples = radio._RESAMPLES["count"]
+        dialogue.timeline.add(_Segment(audio=speech))
+        dialogue.timeline.add(_Segment(silence=500))
+        # Converted once, when the clip enters the timeline
+        self.assertEqual(radio._RESAMPLES["count"], resamples + 1)
+        clip = dialogue.timeline.segments[0].audio
+        self.assertEqual(clip.frame_rate, 44100)
+        self.assertEqual(clip.channels, 2)
+        self.assertEqual(clip.sample_width, 2)
+        self.assertEqual(dialogue.timeline.load(1).channels, 2)
+        # Loading and rendering it again is a plain copy
+        self.assertIs(dialogue.timeline.load(0), clip)
+        pcm = []
+        dialogue.timeline.stream(pcm.append)
+        self.assertEqual(pcm[0], clip.raw_data)
+        self.assertEqual(radio._RESAMPLES["count"], resamples + 1)
+        dialogue.timeline.clear()
+
+    def test_timeline_futures(self):
+        dialogue = Dialogue(self.test_path)
+        speech = Sine(440, sample_rate=22050).to_audio_segment(duration=1000)
+        done, pending = Future(), Future()
+        done.set_result((False, speech, 0))
+        dialogue.timeline.add(_Segment(future=done))
+        dialogue.timeline.add(_Segment(future=pending))
+        dialogue.timeline.add(_Segment(silence=500))
+        # A finished clip is kept as converted audio, which counts towards the budget
+        clip = dialogue.timeline.segments[0].audio
+        self.assertEqual((clip.frame_rate, clip.channels), (44100, 2))
+        self.assertEqual(dialogue.timeline.memory_used, len(clip.raw_data))
+        self.assertEqual(dialogue.timeline.segments[1].future, pending)
+
+        # and is spilled like any other clip
+        pending.set_result((False, speech, 0))
+        dialogue.timeline.memory_budget = 1.5 * len(clip.raw_data)
+        dialogue.timeline.add(_Segment(silence=500))
+        self.assertTrue(dialogue.timeline.segments[0].temporary)
+        self.assertEqual(dialogue.timeline.segments[1].audio, clip)
+        self.assertEqual(dialogue.timeline.memory_used, len(clip.raw_data))
+        dialogue.timeline.clear()
+
+    def test_timeline_load_song(self):
+        dialogue = Dialogue(self.test_path)
+        os.makedirs(self.test_path, exist_ok=True)
+        song_path = f"{self.test_path}/song.wav"
+        Sine(440, sample_rate=22050).to_audio_segment(duration=1000).export(
+            song_path, format="wav"
+        )
+        dialogue.timeline.add(_Segment(path=song_path))
+        resamples = radio._RESAMPLES["count"]
+        song = dialogue.timeline.load(0)
+        # The converted song is kept, so loading it again does not convert it
+        self.assertIs(dialogue.timeline.load(0), song)
+        self.assertEqual(radio._RESAMPLES["count"], resamples + 1)
+        self.assertEqual(dialogue.timeline.memory_used, len(song.raw_data))
+        self.assertTrue(os.path.exists(song_path))
+        dialogue.timeline.clear()
+        os.remove(song_path)
+
     def test_speak_no_speech(self):
         dialogue = Dialogue(self.test_path)
         speech = dialogue.speak(None, announce=False)
         self.assertEqual(speech, None)
 
-    def test_slow_it_down(self):
-        # Generate an mp3 file and fill it with white noise
+    def test_change_tempo(self):
+        # Generate an audio clip and fill it with white noise
         audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        audio_file.export(f"{self.test_path}/a0.wav", format="wav")
-
-        dialogue = Dialogue(self.test_path)
-        dialogue.index = 1
-        dialogue.slow_it_down(start_index=0)
-        self.assertTrue(os.path.exists(f"{self.test_path}/a0.wav"))
-        self.assertTrue(not os.path.exists(f"{self.test_path}/out.wav"))
+        slowed = _change_tempo(audio_file, 0.85)
+        self.assertAlmostEqual(len(slowed), 1000 / 0.85, delta=50)
+
+    def test_synthesize_length_scale(self):
+        synthesizer = MagicMock()
+        synthesizer.output_sample_rate = 22050
+        synthesizer.tts_model.length_scale = 1.0
+
+        def tts(*args, **kwargs):
+            self.assertEqual(synthesizer.tts_model.length_scale, 1.5)
+            return [0.0] * 2205
+
+        synthesizer.tts.side_effect = tts
+        speech = _synthesize(synthesizer, "Speech", length_scale=1.5)
+        self.assertEqual(synthesizer.tts.call_count, 1)
+        self.assertEqual(synthesizer.tts_model.length_scale, 1.0)
+        self.assertEqual(len(speech), 100)
+
+    @patch("radio._change_tempo")
+    def test_synthesize_length_scale_fallback(self, mock_change_tempo):
+        synthesizer = MagicMock()
+        synthesizer.output_sample_rate = 22050
+        synthesizer.tts.return_value = [0.0] * 2205
+        synthesizer.tts_model = object()
+        speech = _synthesize(synthesizer, "Speech", length_scale=2.0)
+        self.assertEqual(mock_change_tempo.call_count, 1)
+        self.assertEqual(mock_change_tempo.call_args.args[1], 0.5)
+        self.assertEqual(speech, mock_change_tempo.return_value)
 
     @patch("pydub.AudioSegment.from_wav")
     def test_background_music(self, mock_from_wav):
+        _background_bed.cache_clear()
         # Generate an mp3 file and fill it with white noise
         audio_file = WhiteNoise().to_audio_segment(duration=1000)
         mock_from_wav.return_value = audio_file
         dialogue = Dialogue(self.test_path)
+        dialogue.timeline.add(_Segment(audio=audio_file))
         dialogue.background_music()
+        self.assertEqual(len(dialogue.timeline), 1)
+        self.assertNotEqual(dialogue.timeline.segments[0].audio, audio_file)
+        _background_bed.cache_clear()
 
-    @patch("pathlib.Path.is_file")
-    @patch("ffmpy.FFmpeg.run")
-    @patch("radio.Dialogue.metadata")
-    def test_cleanup(self, mock_metadata, mock_run, mock_is_file):
+    @patch("pydub.AudioSegment.from_wav")
+    def test_background_music_cached(self, mock_from_wav):
+        _background_bed.cache_clear()
+        mock_from_wav.return_value = WhiteNoise().to_audio_segment(duration=5000)
+        speech = WhiteNoise().to_audio_segment(duration=500)
+        dialogue = Dialogue(self.test_path)
+        for _ in range(3):
+            dialogue.timeline.add(_Segment(audio=speech))
+            dialogue.background_music()
+        # The bed is decoded once, in the broadcast's format
+        self.assertEqual(mock_from_wav.call_count, 1)
+        for segment in dialogue.timeline.segments:
+            self.assertEqual(segment.audio.frame_rate, 44100)
+            self.assertEqual(segment.audio.channels, 2)
+            self.assertEqual(len(segment.audio), 5000)
+        _background_bed.cache_clear()
+
+    def test_cleanup(self):
         # NOTE: Using a different path specifically for this test
         os.mkdir("./test_audio_cleanup/")
 
-        # Generate two mp3 files and fill it with white noise
+        # Generate a spilled clip and fill it with white noise
         audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        audio_file.export("./test_audio_cleanup/a0.wav", format="wav")
-        audio_file.export("./test_audio_cleanup/a1.wav", format="wav")
-
-        # Generate a radio.wav file, which will be deleted
-        audio_file.export("./radio.wav", format="wav")
-
-        # Important, otherwise it will delete your radio.mp3 file
-        mock_is_file.return_value = False
+        audio_file.export("./test_audio_cleanup/spill.wav", format="wav")
 
         dialogue = Dialogue("./test_audio_cleanup/")
-        dialogue.index = 2
+        dialogue.timeline.add(
+            _Segment(path="./test_audio_cleanup/spill.wav", temporary=True)
+        )
+        dialogue.timeline.add(_Segment(silence=2000))
         dialogue.cleanup()
-        self.assertEqual(mock_run.call_count, 1)
-        self.assertEqual(mock_is_file.call_count, 1)
-        self.assertEqual(mock_metadata.call_count, 1)
         self.assertTrue(not os.path.exists("./test_audio_cleanup/"))
-        self.assertTrue(not os.path.exists("./radio.wav"))
 
     @patch("randimage.utils.get_random_image")
     @patch("matplotlib.image.imsave")
@@ -888,23 +1718,14 @@ class Test_Dialogue(unittest.TestCase):
         mock_get_random_image.return_value = MagicMock()
         mock_imsave.return_value = MagicMock()
 
-        metadata_path = f"{self.test_path}/radio.mp3"
-        # Generate an mp3 file and fill it with white noise
-        audio_file = WhiteNoise().to_audio_segment(duration=1000)
-        audio_file.export(metadata_path, format="mp3")
-
-        # Create a simple poster image in jpeg format
-        # https://stackoverflow.com/a/70261284/7543474
-        # License: CC BY-SA 4.0
-        image = Image.new("RGB", (1, 1), color="red")
-        pixels = image.load()
-        pixels[0, 0] = (255, 255, 255)
-        image.save(f"{self.test_path}/poster.jpeg", format="jpeg")
-
         dialogue = Dialogue(self.test_path)
-        dialogue.metadata(metadata_path)
+        dialogue.rec = MagicMock()
+        dialogue.rec.title.return_value = "Morning"
+        poster_path, tags = dialogue.metadata()
 
-        # Restore the original function after the test
+        self.assertEqual(poster_path, f"{self.test_path}/poster.jpeg")
+        self.assertTrue(tags["title"].startswith("Morning: "))
+        self.assertEqual(set(tags), {"title", "album", "artist"})
         mock_get_random_image.assert_called_once()
         mock_imsave.assert_called_once()
 
@@ -920,10 +1741,273 @@ class Test_Dialogue(unittest.TestCase):
         self.assertEqual(cleaned, "ae bee sieh ")
 
     @patch("TTS.utils.synthesizer.Synthesizer.tts")
-    @patch("TTS.utils.synthesizer.Synthesizer.save_wav")
-    def test_save_speech(self, mock_save_wav, mock_tts):
+    def test_save_speech(self, mock_tts):
+        mock_tts.return_value = [0.0] * 2205
         dialogue = Dialogue(self.test_path)
-        dialogue.index = 10
+        dialogue.clip_cache = _ClipCache("./test_tts_cache/", 1024 * 1024)
         dialogue.save_speech("Speech")
         self.assertEqual(mock_tts.call_count, 1)
-        self.assertEqual(mock_save_wav.call_count, 1)
+        self.assertEqual(len(dialogue.timeline), 1)
+        self.assertEqual(dialogue.clip_cache.misses, 1)
+        self.assertEqual(len(os.listdir("./test_tts_cache/")), 1)
+        shutil.rmtree("./test_tts_cache/")
+
+    @patch("TTS.utils.synthesizer.Synthesizer.tts")
+    def test_save_speech_cache_hit(self, mock_tts):
+        dialogue = Dialogue(self.test_path)
+        dialogue.clip_cache = _ClipCache("./test_tts_cache/", 1024 * 1024)
+        key = _ClipCache.key(
+            text="Speech",
+            speaker="p267",
+            model="tts_models/en/vctk/vits",
+            style_wav="",
+            length_scale=1.0,
+        )
+        audio_file = WhiteNoise().to_audio_segment(duration=100)
+        audio_file.export(f"./test_tts_cache/{key}.wav", format="wav")
+
+        dialogue.save_speech("Speech")
+        self.assertEqual(mock_tts.call_count, 0)
+        self.assertEqual(dialogue.clip_cache.hits, 1)
+        self.assertEqual(len(dialogue.timeline), 1)
+        self.assertEqual(len(dialogue.timeline.load(0)), 100)
+
+        shutil.rmtree("./test_tts_cache/")
+
+    def test_clip_cache_eviction(self):
+        audio_file = WhiteNoise().to_audio_segment(duration=100)
+        audio_file.export(f"{self.test_path}/clip.wav", format="wav")
+        size = os.path.getsize(f"{self.test_path}/clip.wav")
+
+        cache = _ClipCache("./test_tts_cache/", 2 * size)
+        for key in ["first", "second"]:
+            cache.store(key, audio_file)
+        os.utime("./test_tts_cache/first.wav", (0, 0))
+        os.utime("./test_tts_cache/second.wav", (1, 1))
+        # Reading "first" makes "second" the least recently used clip
+        self.assertNotEqual(cache.load("first"), None)
+        cache.store("third", audio_file)
+        self.assertTrue(os.path.exists("./test_tts_cache/first.wav"))
+        self.assertTrue(not os.path.exists("./test_tts_cache/second.wav"))
+        self.assertTrue(os.path.exists("./test_tts_cache/third.wav"))
+        self.assertEqual(cache.load("second"), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        os.remove(f"{self.test_path}/clip.wav")
+        shutil.rmtree("./test_tts_cache/")
+
+    @patch("radio._synthesize_batch")
+    def test_save_speech_batch(self, mock_synthesize_batch):
+        mock_synthesize_batch.side_effect = lambda synthesizer, texts, scale: [
+            AudioSegment.silent(duration=10 * len(text)) for text in texts
+        ]
+        cached = AudioSegment.silent(duration=10)
+        dialogue = Dialogue(self.test_path)
+        dialogue.synthesizer = MagicMock()
+        dialogue.synthesizer.output_sample_rate = 10000
+        dialogue.clip_cache = MagicMock()
+        dialogue.clip_cache.load.side_effect = [cached, None, None, None]
+        with patch.dict("radio.TTS", {"batch_size": 2}):
+            dialogue.save_speech_batch(["One", "", "Two", "Three", "Four"])
+        # The cached clip is not synthesized, the rest are split in two batches
+        self.assertEqual(
+            [call.args[1] for call in mock_synthesize_batch.call_args_list],
+            [["Two", "Three"], ["Four"]],
+        )
+        self.assertEqual(dialogue.clip_cache.store.call_count, 3)
+        # The clips keep the order of the texts
+        self.assertEqual(
+            [len(dialogue.timeline.load(i)) for i in range(len(dialogue.timeline))],
+            [10, 30, 50, 40],
+        )
+
+    @patch("radio._change_tempo")
+    def test_synthesize_batch(self, mock_change_tempo):
+        import torch
+
+        synthesizer = MagicMock()
+        synthesizer.output_sample_rate = 10000
+        synthesizer.split_into_sentences.side_effect = lambda text: text.split(". ")
+        synthesizer.tts_config.audio = {"do_trim_silence": True}
+        model = synthesizer.tts_model
+        model.tokenizer.text_to_ids.side_effect = lambda text: [1] * len(text)
+        model.speaker_manager.name_to_id = {radio.TTS["speaker_name"]: 0}
+        model.parameters.side_effect = lambda: iter([torch.zeros(1)])
+        model.config.audio.hop_length = 4
+        # Two samples of trailing silence in every sentence
+        model.ap.find_endpoint.side_effect = lambda wav: len(wav) - 2
+
+        def inference(tokens, aux_input):
+            lengths = aux_input["x_lengths"]
+            frames = torch.arange(tokens.shape[1])[None, :] < lengths[:, None]
+            return {
+                "y_mask": frames.float().unsqueeze(1),
+                "model_outputs": torch.ones((len(lengths), 1, tokens.shape[1] * 4)),
+            }
+
+        model.inference.side_effect = inference
+        clips = radio._synthesize_batch(synthesizer, ["One. Two", "Three"], 1.2)
+        # Every sentence is synthesized in the one batch, trimmed and followed
+        # by a pause: 10 + 10000 + 10 + 10000 and 18 + 10000 samples
+        self.assertEqual(model.inference.call_count, 1)
+        self.assertEqual(model.inference.call_args.args[0].shape, (3, 5))
+        self.assertEqual([len(clip.raw_data) // 2 for clip in clips], [20020, 10018])
+        self.assertEqual(mock_change_tempo.call_count, 0)
+
+        # Models without a speaking rate are slowed down afterwards
+        del model.length_scale
+        mock_change_tempo.side_effect = lambda audio, tempo: audio
+        radio._synthesize_batch(synthesizer, ["One"], 1.25)
+        self.assertEqual(mock_change_tempo.call_count, 1)
+        self.assertEqual(mock_change_tempo.call_args.args[1], 0.8)
+
+    def test_synthesis_server(self):
+        socket_path = "./test_tts.sock"
+        synthesizer = MagicMock()
+        synthesizer.output_sample_rate = 22050
+        synthesizer.tts.return_value = [0.0] * 2205
+        server = SynthesisServer(socket_path, synthesizer)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with patch.dict("radio.TTS", {"daemon_socket": socket_path}):
+                health = _daemon_request({"op": "health"})
+                self.assertEqual(health["requests"], 0)
+                response = _daemon_request({"op": "tts", "text": "Speech"})
+                health = _daemon_request({"op": "health"})
+                with self.assertRaises(RuntimeError):
+                    _daemon_request({"op": "unknown"})
+        finally:
+            server.shutdown()
+            server.server_close()
+            os.remove(socket_path)
+        self.assertEqual(synthesizer.tts.call_count, 1)
+        # The speech is sent back to the client instead of being written by the daemon
+        wav = io.BytesIO(base64.b64decode(response["wav"]))
+        self.assertEqual(len(AudioSegment.from_wav(wav)), 100)
+        self.assertEqual(health["requests"], 1)
+        self.assertNotEqual(health["mean_latency"], None)
+
+    @patch("radio._daemon_request")
+    @patch("radio._synthesize")
+    def test_synthesize_daemon(self, mock_synthesize, mock_daemon_request):
+        def daemon_request(request, timeout=None):
+            if request["op"] == "tts":
+                wav = io.BytesIO()
+                AudioSegment.silent(duration=100).export(wav, format="wav")
+                return {"ok": True, "wav": base64.b64encode(wav.getvalue()).decode()}
+            return {"ok": True}
+
+        mock_daemon_request.side_effect = daemon_request
+        dialogue = Dialogue(self.test_path)
+        speech = dialogue.synthesize("Speech")
+        self.assertEqual(mock_daemon_request.call_count, 2)
+        self.assertEqual(mock_daemon_request.call_args.args[0]["op"], "tts")
+        self.assertEqual(mock_synthesize.call_count, 0)
+        self.assertEqual(len(speech), 100)
+        self.assertTrue(not glob.glob(f"{self.test_path}/tts-*.wav"))
+
+    @patch("radio._daemon_request")
+    @patch("radio._synthesize")
+    def test_synthesize_daemon_failure(self, mock_synthesize, mock_daemon_request):
+        replies = [
+            RuntimeError("Synthesizer daemon failed: ValueError()"),
+            ValueError("Expecting value"),
+            {"ok": True, "wav": base64.b64encode(b"Not a wav").decode()},
+        ]
+
+        def daemon_request(request, timeout=None):
+            if request["op"] == "tts":
+                reply = replies.pop(0)
+                if isinstance(reply, Exception):
+                    raise reply
+                return reply
+            return {"ok": True}
+
+        mock_daemon_request.side_effect = daemon_request
+        dialogue = Dialogue(self.test_path)
+        dialogue.synthesizer = MagicMock()
+        for _ in range(3):
+            dialogue.synthesize("Speech")
+        # Every failed reply falls back to the in-process synthesizer
+        self.assertEqual(mock_synthesize.call_count, 3)
+        self.assertEqual(dialogue.use_daemon, True)
+        self.assertTrue(not glob.glob(f"{self.test_path}/tts-*.wav"))
+
+    @patch("radio._synthesize")
+    def test_synthesize_no_daemon(self, mock_synthesize):
+        dialogue = Dialogue(self.test_path)
+        dialogue.synthesizer = MagicMock()
+        with patch.dict("radio.TTS", {"daemon_socket": "./no_such_daemon.sock"}):
+            dialogue.synthesize("Speech")
+        self.assertEqual(dialogue.use_daemon, False)
+        self.assertEqual(mock_synthesize.call_count, 1)
+
+
+class Test_Audio(unittest.TestCase):
+    """
+    Golden tests of the NumPy audio core against the pydub pipeline
+    """
+
+    @staticmethod
+    def frames(audio):
+        return numpy.frombuffer(audio.raw_data, dtype=numpy.int16).astype(int)
+
+    def assertClose(self, expected, actual, tolerance=1):
+        expected, actual = self.frames(expected), self.frames(actual)
+        length = min(len(expected), len(actual))
+        # Resampling may differ by a frame or two in length
+        self.assertLessEqual(abs(len(expected) - len(actual)), 4)
+        error = numpy.abs(expected[:length] - actual[:length]).max()
+        self.assertLessEqual(error, tolerance)
+
+    def test_round_trip(self):
+        audio_file = WhiteNoise(sample_rate=22050).to_audio_segment(duration=1000)
+        samples = _to_array(audio_file)
+        self.assertEqual(samples.dtype, numpy.float32)
+        self.assertEqual(samples.shape, (22050, 1))
+        self.assertEqual(_to_segment(samples, 22050).raw_data, audio_file.raw_data)
+
+    def test_slice(self):
+        audio_file = WhiteNoise().to_audio_segment(duration=1000)
+        clip = _to_segment(_to_array(audio_file, 250, 750), audio_file.frame_rate)
+        self.assertEqual(clip.raw_data, audio_file[250:750].raw_data)
+
+    def test_gain(self):
+        audio_file = WhiteNoise().to_audio_segment(duration=1000, volume=-6)
+        samples = _gain(_to_array(audio_file), -10)
+        self.assertClose(audio_file - 10, _to_segment(samples, 44100))
+
+    def test_duck(self):
+        audio_file = WhiteNoise().to_audio_segment(duration=1000, volume=-6)
+        samples = _to_array(audio_file)
+        ducked = _gain(samples, -10, start=11025, stop=22050)
+        numpy.testing.assert_array_equal(ducked[:11025], samples[:11025])
+        numpy.testing.assert_array_equal(ducked[22050:], samples[22050:])
+        expected = audio_file[:250] + (audio_file[250:500] - 10) + audio_file[500:]
+        self.assertClose(expected, _to_segment(ducked, 44100))
+
+    def test_overlay(self):
+        base = WhiteNoise().to_audio_segment(duration=1000, volume=-6)
+        speech = WhiteNoise().to_audio_segment(duration=500, volume=-6)
+        # The speech runs past the end of the base, which is kept as long
+        mixed = _overlay(_to_array(base), _to_array(speech), 44100 * 750 // 1000)
+        self.assertClose(base.overlay(speech, position=750), _to_segment(mixed, 44100))
+
+    def test_conform(self):
+        speech = Sine(440, sample_rate=22050).to_audio_segment(duration=1000, volume=-6)
+        expected = speech.set_frame_rate(44100).set_channels(2)
+        self.assertClose(expected, _to_segment(_conform(speech), 44100))
+
+    @patch("pydub.AudioSegment.from_wav")
+    def test_add_background_music(self, mock_from_wav):
+        _background_bed.cache_clear()
+        background = WhiteNoise().to_audio_segment(duration=8000, volume=-6)
+        mock_from_wav.return_value = background
+        speech = Sine(440, sample_rate=22050).to_audio_segment(duration=2000, volume=-6)
+        # The previous pydub implementation, as rendered into the broadcast
+        expected = (background - 25).overlay(speech, position=4000).set_channels(2)
+        with patch.dict("radio.TTS", {"backg_music_vol": 1}):
+            actual = _add_background_music(speech)
+        self.assertClose(expected, actual, tolerance=2)
+        _background_bed.cache_clear()